@@ -0,0 +1,264 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import contextlib
+import hashlib
+import inspect
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+import snsim.xmlloader
+import snsim.policy
+import snsim.engine
+import snsim.trace
+import snsim.generator
+import snsim.bouncer
+import snsim.synthetic
+
+FORMAT_VERSION = 1
+SCENARIOS = ['../scenarios/scenario_01.xml', '../scenarios/scenario_02.xml', '../scenarios/scenario_03.xml']
+GENERATED = ['medium', 'large']
+# Engines that must produce the same traces (see verify), and the
+# decimals of the accumulated values that they must agree on
+DECIMALS = 6
+ENGINES = [snsim.engine.TickEngine, snsim.engine.EventEngine]
+# Relative change of a measure that counts as a regression
+TOLERANCE = 0.1
+
+def getPolicies():
+    # All policies defined in snsim.policy, in the order of definition
+    policies = [cls for name, cls in inspect.getmembers(snsim.policy, inspect.isclass) \
+                if name.endswith('Policy') and cls.__module__ == snsim.policy.__name__]
+    return sorted(policies, key = lambda cls: inspect.getsourcelines(cls)[1])
+
+def prepareScenarios(directory, sizes = GENERATED):
+    '''Returns (name, filename, arrivals) for the bundled scenarios and
+    the generated ones of the given sizes, which are written to
+    directory unless present. Generated scenarios get Poisson arrivals
+    in proportion to their number of pools, so their load is comparable
+    to the bundled ones.
+    '''
+    
+    scenarios = []
+    for filename in SCENARIOS:
+        scenarios.append((os.path.splitext(os.path.basename(filename))[0], filename, None))
+    for size in sizes:
+        filename = os.path.join(directory, 'synthetic_%s.xml' % (size))
+        if not os.path.exists(filename):
+            snsim.synthetic.SyntheticScenarioGenerator(**snsim.synthetic.SIZES[size]).write(filename)
+        arrivals = snsim.generator.PoissonArrivals(2.5 * snsim.synthetic.SIZES[size]['pools'])
+        scenarios.append(('synthetic_%s' % (size), filename, arrivals))
+    return scenarios
+
+def _createScenario(filename, arrivals, policy, bouncer, engine = snsim.engine.TickEngine):
+    scenario = snsim.xmlloader.XMLScenarioLoader(filename, snsim.xmlloader.DEFAULT_CACHE_DIRECTORY).getScenario()
+    scenario.setGenerator(snsim.generator.JobGenerator, arrivals = arrivals)
+    if bouncer:
+        scenario.setBouncer(snsim.bouncer.Bouncer)
+    scenario.setPolicy(policy)
+    scenario.setEngine(engine)
+    return scenario
+
+def getFingerprint(scenario):
+    '''Returns a digest of what the last run of a scenario produced:
+    the load trace without timings, the scheduling data, the aborts and
+    the bouncer trace.
+    '''
+    
+    digest = hashlib.sha1()
+    for name in snsim.trace.LoadTrace.COUNTERS:
+        digest.update(scenario.loadData.getColumn(name).tobytes())
+    # Engines may add up biddings and penalties in a different order
+    for name in snsim.trace.LoadTrace.VALUES:
+        digest.update(numpy.round(scenario.loadData.getColumn(name), DECIMALS).tobytes())
+    digest.update(scenario.loadData.getResources().tobytes())
+    bouncerTrace = scenario.bouncer.trace if scenario.bouncer else None
+    digest.update(json.dumps([scenario.scheduleData, scenario.plotAborts, bouncerTrace], sort_keys = True).encode())
+    return digest.hexdigest()
+
+def measure(filename, arrivals, policy, bouncer, iterations, repeat = 3):
+    '''Runs a scenario repeat times and returns the best throughput in
+    simulated ticks and generated jobs per second, along with the time
+    per phase of that run (see snsim.timing). The peak memory
+    allocated while running is measured in one more run, since tracing
+    allocations slows the simulation down. All runs start from the same
+    seed and must give the same traces, otherwise
+    NotRepeatableException is raised.
+    '''
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        scenario = _createScenario(filename, arrivals, policy, bouncer)
+        elapsed = None
+        fingerprints = set()
+        for i in range(repeat):
+            startTime = time.perf_counter()
+            scenario.start(maxIterations = iterations)
+            runTime = time.perf_counter() - startTime
+            if elapsed is None or runTime < elapsed:
+                elapsed = runTime
+                phases = scenario.timer.getTotals()
+            fingerprints.add(getFingerprint(scenario))
+        
+        tracemalloc.start()
+        scenario.start(maxIterations = iterations)
+        peakMemory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        fingerprints.add(getFingerprint(scenario))
+    
+    if len(fingerprints) > 1:
+        raise NotRepeatableException('%s, %s, bouncer %s' % (filename, policy.__name__, bouncer))
+    
+    result = dict()
+    result['ticks'] = scenario.numIterations
+    result['jobs'] = scenario.generator.nextJobId
+    result['elapsed'] = elapsed
+    result['ticksPerSecond'] = scenario.numIterations / elapsed
+    result['jobsPerSecond'] = scenario.generator.nextJobId / elapsed
+    result['peakMemory'] = peakMemory
+    result['phases'] = phases
+    return result
+
+def runSuite(filename, iterations = 1000, sizes = GENERATED, repeat = 3, directory = snsim.synthetic.DIRECTORY):
+    '''Measures every scenario with every policy, with and without
+    bouncer, and writes the results to filename in JSON format.
+    '''
+    
+    results = []
+    for name, scenarioFilename, arrivals in prepareScenarios(directory, sizes):
+        for policy in getPolicies():
+            for bouncer in [False, True]:
+                result = measure(scenarioFilename, arrivals, policy, bouncer, iterations, repeat)
+                result['scenario'] = name
+                result['policy'] = policy.__name__
+                result['bouncer'] = bouncer
+                results.append(result)
+                print('%-20s %-30s %-5s %10.1f ticks/s %10.1f jobs/s %8.1f MB' % (name, policy.__name__, bouncer, \
+                      result['ticksPerSecond'], result['jobsPerSecond'], result['peakMemory'] / 1048576.0))
+    
+    report = dict()
+    report['version'] = FORMAT_VERSION
+    report['python'] = platform.python_version()
+    report['platform'] = platform.platform()
+    report['iterations'] = iterations
+    report['repeat'] = repeat
+    report['results'] = results
+    with open(filename, 'w') as outfile:
+        json.dump(report, outfile, indent = 1, sort_keys = True)
+    print('File \'%s\' written.' % (filename))
+
+def verify(iterations = 300, sizes = GENERATED, directory = snsim.synthetic.DIRECTORY, engines = ENGINES):
+    '''Runs the generated scenarios, whose signatures use services more
+    than once, with every policy and engine, with and without bouncer,
+    and returns the cases in which an engine's traces differ from those
+    of the first engine, as (case, engine) tuples.
+    '''
+    
+    mismatches = []
+    for name, scenarioFilename, arrivals in prepareScenarios(directory, sizes)[len(SCENARIOS):]:
+        for policy in getPolicies():
+            for bouncer in [False, True]:
+                fingerprints = []
+                for engine in engines:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        scenario = _createScenario(scenarioFilename, arrivals, policy, bouncer, engine)
+                        scenario.start(maxIterations = iterations)
+                    fingerprints.append(getFingerprint(scenario))
+                    if fingerprints[-1] != fingerprints[0]:
+                        mismatches.append(((name, policy.__name__, bouncer), engine.__name__))
+                print('%-20s %-30s %-5s %s' % (name, policy.__name__, bouncer, \
+                      'ok' if len(set(fingerprints)) == 1 else 'MISMATCH'))
+    print('%d mismatches found.' % (len(mismatches)))
+    return mismatches
+
+def _getKey(result):
+    return (result['scenario'], result['policy'], result['bouncer'])
+
+def compare(baselineFilename, filename, tolerance = TOLERANCE):
+    '''Compares results to a baseline and returns the regressions, i.e.
+    throughputs that dropped or peak memory that grew by more than the
+    tolerance, as (case, measure, baseline value, value) tuples.
+    '''
+    
+    with open(baselineFilename) as infile:
+        baseline = dict((_getKey(result), result) for result in json.load(infile)['results'])
+    with open(filename) as infile:
+        results = json.load(infile)['results']
+    
+    regressions = []
+    for result in results:
+        key = _getKey(result)
+        if key not in baseline:
+            print('%-20s %-30s %-5s not in baseline' % key)
+            continue
+        for measureName, higherIsBetter in [('ticksPerSecond', True), ('jobsPerSecond', True), ('peakMemory', False)]:
+            old = baseline[key][measureName]
+            new = result[measureName]
+            if old == 0:
+                continue
+            change = (new - old) / float(old)
+            flag = ''
+            if (higherIsBetter and change < -tolerance) or (not higherIsBetter and change > tolerance):
+                regressions.append((key, measureName, old, new))
+                flag = ' REGRESSION'
+            print('%-20s %-30s %-5s %-15s %+7.1f%%%s' % (key + (measureName, 100.0 * change, flag)))
+    print('%d regressions found.' % (len(regressions)))
+    return regressions
+
+def launch():
+    '''Usage: benchmark.py run [results] [iterations]
+           benchmark.py compare baseline results [tolerance]
+           benchmark.py verify [iterations]
+    '''
+    
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'run'
+    if mode == 'run':
+        filename = sys.argv[2] if len(sys.argv) > 2 else '../reports/benchmark.json'
+        iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+        runSuite(filename, iterations)
+    elif mode == 'compare' and len(sys.argv) > 3:
+        tolerance = float(sys.argv[4]) if len(sys.argv) > 4 else TOLERANCE
+        if len(compare(sys.argv[2], sys.argv[3], tolerance)):
+            sys.exit(1)
+    elif mode == 'verify':
+        iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+        if len(verify(iterations)):
+            sys.exit(1)
+    else:
+        print(launch.__doc__)
+        sys.exit(2)
+
+
+class NotRepeatableException(Exception):
+    '''Raised when runs of a scenario from the same seed give different
+    traces (see measure).
+    '''
+    pass
+
+
+if __name__ == '__main__':
+    launch()
@@ -0,0 +1,57 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import sys
+import tracemalloc
+
+import snsim.xmlloader
+import snsim.job
+
+def measure(filename, count):
+    '''Measures the memory held by a number of live job instances
+    (including their pending service instances) of the given scenario.
+    Returns the bytes per live job and the number of pending services.
+    '''
+    
+    loader = snsim.xmlloader.XMLScenarioLoader(filename)
+    jobTemplates = [loader.jobTemplates[k] for k in sorted(loader.jobTemplates.keys())]
+    customers = [loader.customers[k] for k in sorted(loader.customers.keys())]
+    
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    jobs = []
+    for id in range(count):
+        jobs.append(snsim.job.JobInstance(id, jobTemplates[id % len(jobTemplates)], customers[id % len(customers)]))
+    allocated = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    
+    numServices = sum([len(job.getPendingServices()) for job in jobs])
+    return float(allocated) / count, numServices
+
+def launch():
+    filename = sys.argv[1] if len(sys.argv) > 1 else '../scenarios/scenario_03.xml'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    
+    bytesPerJob, numServices = measure(filename, count)
+    print('%d live jobs with %d pending services: %.1f bytes per live job.' % (count, numServices, bytesPerJob))
+
+if __name__ == '__main__':
+    launch()
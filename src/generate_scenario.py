@@ -0,0 +1,41 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import os
+import sys
+
+import snsim.synthetic
+
+def launch():
+    '''Writes a synthetic scenario of one of the predefined sizes,
+    e.g. "python generate_scenario.py large ../scenarios/large.xml".
+    Without filename, it goes to the scratch directory (see
+    snsim.synthetic.DIRECTORY).
+    '''
+    
+    size = sys.argv[1] if len(sys.argv) > 1 else 'medium'
+    filename = sys.argv[2] if len(sys.argv) > 2 else os.path.join(snsim.synthetic.DIRECTORY, 'synthetic_%s.xml' % (size))
+    
+    generator = snsim.synthetic.SyntheticScenarioGenerator(**snsim.synthetic.SIZES[size])
+    generator.write(filename)
+
+if __name__ == '__main__':
+    launch()
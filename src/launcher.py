@@ -27,9 +27,12 @@ import snsim.xmlloader
 import snsim.policy
 import snsim.generator
 import snsim.bouncer
+import snsim.comparison
+import snsim.branching
+import snsim.admission
 
 def launch():
-    loader = snsim.xmlloader.XMLScenarioLoader('../scenarios/scenario_03.xml')
+    loader = snsim.xmlloader.XMLScenarioLoader('../scenarios/scenario_03.xml', snsim.xmlloader.DEFAULT_CACHE_DIRECTORY)
     
     scenario = loader.getScenario()
     scenario.setGenerator(snsim.generator.JobGenerator)
@@ -46,6 +49,49 @@ def launch():
     scenario.start(maxIterations = it)
     scenario.bouncer.exportTrace('../reports/trace_bouncer_active.out')
     scenario.exportTrace('../reports/trace_scenario_active.out')
+
+def compare():
+    policies = [snsim.policy.FCFSPolicy,
+                snsim.policy.RatioBasedPolicy,
+                snsim.policy.RevenueBasedPolicy,
+                snsim.policy.PenaltyBasedPolicy,
+                snsim.policy.ClassifiedPenaltyBasedPolicy,
+                snsim.policy.FailedAttemptsBasedPolicy]
+    comparison = snsim.comparison.PolicyComparison('../scenarios/scenario_03.xml', policies, 
+                                                   bouncerModes = [False, True], maxIterations = 5000,
+                                                   cacheDirectory = snsim.xmlloader.DEFAULT_CACHE_DIRECTORY)
+    comparison.run(reportDirectory = '../reports')
+    comparison.exportSummary('../reports/comparison_summary.out')
+
+def whatIf():
+    loader = snsim.xmlloader.XMLScenarioLoader('../scenarios/scenario_03.xml', snsim.xmlloader.DEFAULT_CACHE_DIRECTORY)
+    
+    scenario = loader.getScenario()
+    scenario.setGenerator(snsim.generator.JobGenerator)
+    scenario.setBouncer(snsim.bouncer.Bouncer)
+    scenario.bouncer.debugSetAcceptAll(True)
+    scenario.setPolicy(snsim.policy.PenaltyBasedPolicy)
+    
+    branches = [snsim.branching.Branch('penalty'),
+                snsim.branching.Branch('failedattempts', policy = snsim.policy.FailedAttemptsBasedPolicy),
+                snsim.branching.Branch('bouncer', bouncerActive = True)]
+    branching = snsim.branching.WhatIfBranching(scenario, 3000, branches)
+    branching.run(maxIterations = 5000)
+    branching.exportTraces('../reports')
+
+def trainAdmission():
+    loader = snsim.xmlloader.XMLScenarioLoader('../scenarios/scenario_03.xml', snsim.xmlloader.DEFAULT_CACHE_DIRECTORY)
+    
+    scenario = loader.getScenario()
+    scenario.setGenerator(snsim.generator.JobGenerator)
+    scenario.setBouncer(snsim.admission.TabularAdmissionController)
+    scenario.setPolicy(snsim.policy.PenaltyBasedPolicy)
+    
+    seeds = ['train:%d' % (i) for i in range(20)]
+    snsim.admission.train(scenario, 1000, maxIterations = 1000, seeds = seeds)
+    scenario.start(maxIterations = 5000)
+    scenario.bouncer.exportTrace('../reports/trace_bouncer_learned.out')
+    scenario.exportTrace('../reports/trace_scenario_learned.out')
     
 if __name__ == '__main__':
     launch()
@@ -0,0 +1,244 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import random
+
+import numpy
+
+class AdmissionController:
+    '''Defines a learning admission controller that can be set on a
+    scenario instead of the slope-based bouncer (Scenario.setBouncer).
+    Each iteration it observes a compact state vector: the number of
+    active jobs, the load ratio of every resource and the number of
+    newly generated jobs. It then accepts or declines the new jobs
+    template by template. The reward of an iteration is the change of
+    revenue minus penalty accumulated by the scenario; it is credited
+    to every decision of the previous iteration (Q-learning).
+    Learned values survive reset(), so the same scenario objects can be
+    started episode after episode to train the controller (see train).
+    Subclasses define how action values are stored and updated.
+    '''
+    
+    DECLINE = 0
+    ACCEPT = 1
+    
+    def __init__(self):
+        self.name = 'Admission Controller'
+        # Only the last load entry is needed, e.g. by streamed traces
+        self.horizon = 1
+        self.debugAcceptAll = False
+        self.training = True
+        self.alpha = 0.1
+        self.gamma = 0.9
+        self.exploration = 0.1
+        self.random = random.Random(0)
+        self.reset()
+    
+    def __str__(self):
+        return str(self.name.replace(' ', '_'))
+    
+    def reset(self):
+        # Resets the episode, but keeps everything learned
+        self.trace = []
+        self.decisions = []
+        self.lastValue = 0.0
+    
+    def debugSetAcceptAll(self, accept):
+        self.debugAcceptAll = accept
+    
+    def setTraining(self, training):
+        # Without training, decisions are greedy and values stay fixed
+        self.training = training
+    
+    def setLearning(self, alpha = None, gamma = None, exploration = None):
+        if alpha is not None:
+            self.alpha = alpha
+        if gamma is not None:
+            self.gamma = gamma
+        if exploration is not None:
+            self.exploration = exploration
+    
+    def setRandomSeed(self, seed):
+        # Explorations draw from their own generator, never from the
+        # scenario's, so job generation is the same in every episode.
+        self.random = random.Random(seed)
+    
+    def getState(self, jobs, loadData):
+        # Returns (active jobs, resource loads..., new jobs)
+        if not len(loadData):
+            return [0.0] * (len(loadData.resourceNames) + 1) + [float(len(jobs))]
+        last = len(loadData) - 1 - loadData.offset
+        state = [float(loadData.getColumn('activeJobs')[last])]
+        state.extend(loadData.getResources()[last].tolist())
+        state.append(float(len(jobs)))
+        return state
+    
+    def _getValue(self, loadData):
+        if not len(loadData):
+            return 0.0
+        last = len(loadData) - 1 - loadData.offset
+        return float(loadData.getColumn('biddings')[last] - loadData.getColumn('penalty')[last])
+    
+    def filterJobs(self, jobs, loadData):
+        state = self.getState(jobs, loadData)
+        key = self._getKey(state)
+        value = self._getValue(loadData)
+        reward = value - self.lastValue
+        self.lastValue = value
+        
+        if self.training:
+            for previousKey, template, action in self.decisions:
+                target = reward + self.gamma * max(self._getActionValues(key, template))
+                self._update(previousKey, template, action, target)
+        
+        jobsByTemplate = dict()
+        for job in jobs:
+            identifier = job.template.identifier
+            if identifier not in jobsByTemplate:
+                jobsByTemplate[identifier] = []
+            jobsByTemplate[identifier].append(job)
+        
+        accepted = set()
+        declined = set()
+        self.decisions = []
+        for template in sorted(jobsByTemplate.keys()):
+            if self.debugAcceptAll:
+                # Only the action actually taken may be learned from
+                action = self.ACCEPT
+            else:
+                action = self._chooseAction(key, template)
+            self.decisions.append((key, template, action))
+            if action == self.ACCEPT:
+                accepted.update(jobsByTemplate[template])
+            else:
+                declined.update(jobsByTemplate[template])
+        
+        quota = float(len(accepted)) / float(len(jobs)) if len(jobs) else 1.0
+        self.trace.append('%03d %.2f, %.2f %d %.2f %.2f' % (len(loadData) - 1, state[0], reward, len(jobs), value, quota))
+        return accepted, declined
+    
+    def _chooseAction(self, key, template):
+        if self.training and self.random.random() < self.exploration:
+            return self.random.choice((self.DECLINE, self.ACCEPT))
+        values = self._getActionValues(key, template)
+        # Ties are resolved in favour of accepting
+        return self.ACCEPT if values[self.ACCEPT] >= values[self.DECLINE] else self.DECLINE
+    
+    def exportTrace(self, filename):
+        with open(filename, 'w') as outfile:
+            for i in self.trace:
+                outfile.write('%s\n' % (i))
+            print('File \'%s\' written.' % (filename))
+
+
+class TabularAdmissionController(AdmissionController):
+    '''Defines an admission controller that keeps one pair of action
+    values per template and discretized state. Active jobs are binned
+    in steps of queueStep, resource loads in loadBins buckets of equal
+    width and new jobs by their number, each up to a maximum bucket.
+    '''
+    
+    def __init__(self):
+        self.queueStep = 10
+        self.queueBins = 10
+        self.loadBins = 5
+        self.rateBins = 6
+        self.values = dict()
+        AdmissionController.__init__(self)
+        self.name = 'Tabular Admission Controller'
+    
+    def _getKey(self, state):
+        key = [min(int(state[0] / self.queueStep), self.queueBins - 1)]
+        for load in state[1:-1]:
+            key.append(min(int(load * self.loadBins), self.loadBins - 1))
+        key.append(min(int(state[-1]), self.rateBins - 1))
+        return tuple(key)
+    
+    def _getActionValues(self, key, template):
+        return self.values.get((key, template), (0.0, 0.0))
+    
+    def _update(self, key, template, action, target):
+        values = list(self._getActionValues(key, template))
+        values[action] += self.alpha * (target - values[action])
+        self.values[(key, template)] = values
+
+
+class LinearAdmissionController(AdmissionController):
+    '''Defines an admission controller that approximates the action
+    values of each template linearly in the state vector. Features are
+    a bias, the active jobs divided by queueScale, the resource loads
+    and the new jobs divided by rateScale. Weights are updated by
+    gradient steps towards the Q-learning target.
+    '''
+    
+    def __init__(self):
+        self.queueScale = 100.0
+        self.rateScale = 5.0
+        self.weights = dict()
+        AdmissionController.__init__(self)
+        self.name = 'Linear Admission Controller'
+        self.alpha = 0.01
+    
+    def _getKey(self, state):
+        features = numpy.empty(len(state) + 1)
+        features[0] = 1.0
+        features[1] = state[0] / self.queueScale
+        features[2:-1] = state[1:-1]
+        features[-1] = state[-1] / self.rateScale
+        return features
+    
+    def _getWeights(self, template, size):
+        if template not in self.weights:
+            self.weights[template] = numpy.zeros((2, size))
+        return self.weights[template]
+    
+    def _getActionValues(self, key, template):
+        return self._getWeights(template, len(key)).dot(key)
+    
+    def _update(self, key, template, action, target):
+        weights = self._getWeights(template, len(key))
+        weights[action] += self.alpha * (target - weights[action].dot(key)) * key
+
+
+def train(scenario, episodes, maxIterations = None, seeds = None):
+    '''Trains the admission controller set on the scenario by starting
+    the same scenario episodes times, optionally with another Seed
+    parameter per episode. Returns the revenue minus penalty reached
+    in each episode.
+    '''
+    controller = scenario.bouncer
+    controller.setTraining(True)
+    baseSeed = scenario.parameters.get('Seed')
+    returns = []
+    try:
+        for episode in range(episodes):
+            if seeds is not None:
+                scenario.parameters['Seed'] = seeds[episode % len(seeds)]
+            scenario.start(maxIterations = maxIterations)
+            returns.append(scenario.sumBiddings - scenario.sumPenalty)
+    finally:
+        # Restore the scenario as given, also if it had no Seed at all
+        if baseSeed is None:
+            scenario.parameters.pop('Seed', None)
+        else:
+            scenario.parameters['Seed'] = baseSeed
+        controller.setTraining(False)
+    return returns
@@ -19,13 +19,19 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
 # IN THE SOFTWARE.
 
-import numpy
+import collections
 
 class Bouncer:
     '''Defines a bouncer, wich splits the set of given newly generated
     jobs into a set of accepted and a set of declined jobs by watching
     the system state of the past and current iterations. Can implement
     a reinforcement learning approach, if desired.
+    All estimates are kept incrementally over a window of the last
+    horizon iterations: the load of each iteration is computed once,
+    the smoothed tendency and its least-squares slope come from running
+    sums and the maximum slope from a monotonic queue, so the cost per
+    iteration does not depend on the horizon except for the weighted
+    load differences (see _weightedTendency).
     '''
     
     def __init__(self):
@@ -35,77 +41,122 @@ class Bouncer:
     
     def reset(self):
         self.trace = []
-        self.tendency = []
-        self.derivative = []
         self.fullTrace = []
+        
+        # Loads of the last horizon iterations, the newest one last
+        self.loads = collections.deque(maxlen = self.horizon)
+        self.loadIndex = -1
+        
+        # Smoothed tendencies of the last horizon iterations and their
+        # running sums Sum(y) and Sum(k * y), k counting from the oldest
+        self.tendency = collections.deque(maxlen = self.horizon)
+        self.tendencySum = 0.0
+        self.tendencyMoment = 0.0
+        self.tendencyUpdates = 0
+        
+        # (iteration, derivative) pairs with decreasing derivatives,
+        # the first one is the maximum of the last horizon iterations
+        self.derivative = collections.deque()
+        self.derivativeCount = 0
     
     def debugSetAcceptAll(self, accept):
         self.debugAcceptAll = accept
     
     def _load(self, t):
-        try:
-            serviceCount = float(self.fullTrace[t]['activeServices'])
-            
-            #maxRes = 0.0
-            #for resPool in self.fullTrace[t]['resources']:
-            #    for resource in self.fullTrace[t]['resources'][resPool]:
-            #        if self.fullTrace[t]['resources'][resPool][resource] > maxRes:
-            #            maxRes = self.fullTrace[t]['resources'][resPool][resource]
-            
-            accLoad = 0.0
-            resourceCount = 0
-            for resPool in self.fullTrace[t]['resources']:
-                for resource in self.fullTrace[t]['resources'][resPool]:
-                    resourceCount += 1
-                    accLoad += serviceCount * self.fullTrace[t]['resources'][resPool][resource]
-
-            return accLoad / resourceCount
-            #return float(self.fullTrace[t]['activeServices'])
-        except IndexError:
+        if t >= len(self.fullTrace):
             return 0.0
+        
+        # Streamed traces only keep the iterations from offset on
+        t -= self.fullTrace.offset
+        serviceCount = float(self.fullTrace.getColumn('activeServices')[t])
+        
+        #maxRes = self.fullTrace.getResources()[t].max()
+        
+        resources = self.fullTrace.getResources()[t]
+        accLoad = 0.0
+        for load in resources.tolist():
+            accLoad += serviceCount * load
+        
+        return accLoad / len(resources)
+        #return float(self.fullTrace.getColumn('activeServices')[t])
+    
+    def _updateLoads(self, lastIndex):
+        # Computes the load of every iteration only once. A trace that
+        # was replaced or shortened is read again from scratch.
+        if lastIndex < self.loadIndex:
+            self.loads.clear()
+            self.loadIndex = -1
+        first = max(self.loadIndex + 1, lastIndex - self.horizon + 1)
+        for t in range(first, lastIndex + 1):
+            self.loads.append(self._load(t))
+        self.loadIndex = lastIndex
     
     def _weightedTendency(self):
-        if not len(self.fullTrace):
-            return 0.0
-        
+        # Mean of the load differences to the previous iterations,
+        # weighted by 1 / distance. Harmonic weights have no recurrence,
+        # so this remains a loop over the (cached) window.
         if len(self.fullTrace) < self.horizon + 1:
             horizon = len(self.fullTrace) - 1
         else:
             horizon = self.horizon
         
-        lastIndex = len(self.fullTrace) - 1
-        weightedDiffs = []
+        loads = self.loads
+        last = loads[-1]
+        accumulated = 0.0
         for offset in range(1, horizon):
-            weightedDiffs.append((self._load(lastIndex) - self._load(lastIndex - offset)) / float(offset))
+            accumulated += (last - loads[-1 - offset]) / float(offset)
         
-        return sum(weightedDiffs) / float(horizon)
+        return accumulated / float(horizon)
+    
+    def _smoothTendency(self, tendency):
+        # Mean of the given tendency and the previous ones within the
+        # horizon (one less while fewer are known)
+        if not len(self.tendency):
+            return tendency
+        return (tendency + self.tendencySum - self.tendency[0]) / float(len(self.tendency))
+    
+    def _addTendency(self, tendency):
+        count = len(self.tendency)
+        if count == self.horizon:
+            oldest = self.tendency[0]
+            self.tendencyMoment += (count - 1) * tendency - (self.tendencySum - oldest)
+            self.tendencySum += tendency - oldest
+        else:
+            self.tendencyMoment += count * tendency
+            self.tendencySum += tendency
+        self.tendency.append(tendency)
+        
+        self.tendencyUpdates += 1
+        if self.tendencyUpdates % self.horizon == 0:
+            # Recompute the sums once in a while to bound rounding drift
+            self.tendencySum = sum(self.tendency)
+            self.tendencyMoment = sum([k * y for k, y in enumerate(self.tendency)])
+    
+    def _addDerivative(self, derivative):
+        index = self.derivativeCount
+        self.derivativeCount += 1
+        while len(self.derivative) and self.derivative[-1][1] <= derivative:
+            self.derivative.pop()
+        self.derivative.append((index, derivative))
+        if self.derivative[0][0] <= index - self.horizon:
+            self.derivative.popleft()
+        return self.derivative[0][1]
     
-    def _smoothTendency(self, horizon):
-        if len(self.tendency) < horizon + 1:
-            horizon = len(self.tendency) - 1
-        
-        # Smoothes the last value based on the given horizon in-place!
-        accumulated = float(self.tendency[-1])
-        for offset in range(2, horizon + 1):
-            accumulated += float(self.tendency[-offset])
-        self.tendency[-1] = accumulated / float(horizon)
-            
     def filterJobs(self, jobs, loadData):
         self.fullTrace = loadData
         
         if len(self.fullTrace) < 2:
             # Accept all jobs if not enough load data is present
-            self.tendency.append(0.0)
+            self._addTendency(0.0)
             return jobs, set()
         
         lastIndex = len(self.fullTrace) - 1
-        basevalue = self._load(lastIndex)
-        self.tendency.append(self._weightedTendency())
-        self._smoothTendency(self.horizon)
-        tendency = self.tendency[-1]
-        self.derivative.append(self.deriveCurrent())
-        derivative = self.derivative[-1]
-        maxDervInHorizon = max(self.derivative[-self.horizon:])
+        self._updateLoads(lastIndex)
+        basevalue = self.loads[-1]
+        tendency = self._smoothTendency(self._weightedTendency())
+        derivative = self.deriveCurrent()
+        self._addTendency(tendency)
+        maxDervInHorizon = self._addDerivative(derivative)
         
         pivot = 0
         quota = 0.0
@@ -137,32 +188,18 @@ class Bouncer:
         return set(orderedJobs[:pivot]), set(orderedJobs[pivot:])
     
     def deriveCurrent(self):
-        hist = self.horizon
-        if len(self.tendency) < hist + 1:
-            hist = len(self.tendency) - 1
-            if hist < 1:
-                return 0.0
-        
-        x = [(len(self.tendency) - 1) - (hist - i) for i in range(hist)]
-        y = [self.tendency[(len(self.tendency) - 1) - (hist - i)] for i in range(hist)]
-        
-        coeffs = numpy.polyfit(x, y, deg = 1)
-        
-        h = 0.001
-        e = 1e-08
-        reg = numpy.poly1d(coeffs)
-        ref = (numpy.polyval(reg, [self.tendency[-1] + h])[0] - numpy.polyval(reg, self.tendency[-1:])[0]) / h
-        while True:
-            h /= 2.0
-            new = (numpy.polyval(reg, [self.tendency[-1] + h])[0] - numpy.polyval(reg, self.tendency[-1:])[0]) / h
-            diff = abs(ref - new)
-            ref = new
-            if diff < e: break
-        return ref
+        # Slope of the least-squares line through the previous smoothed
+        # tendencies within the horizon, in closed form:
+        # (n Sum(ky) - Sum(k) Sum(y)) / (n Sum(k^2) - Sum(k)^2)
+        count = len(self.tendency)
+        if count < 2:
+            return 0.0
+        sumK = count * (count - 1) / 2.0
+        sumKK = (count - 1) * count * (2 * count - 1) / 6.0
+        return (count * self.tendencyMoment - sumK * self.tendencySum) / (count * sumKK - sumK * sumK)
     
     def exportTrace(self, filename):
         with open(filename, 'w') as outfile:
             for i in self.trace:
                 outfile.write('%s\n' % (i))
             print('File \'%s\' written.' % (filename))
-    
\ No newline at end of file
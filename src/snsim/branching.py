@@ -0,0 +1,144 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import multiprocessing
+import random
+import shutil
+import time
+
+import snsim.checkpoint
+import snsim.trace
+
+# Scenario at the branch point. Set before the worker pool is forked,
+# so every worker starts from a copy-on-write image of it.
+_branchScenario = None
+
+def _runBranch(task):
+    branch, maxIterations = task
+    scenario = _branchScenario
+    branch.apply(scenario)
+    
+    startTime = time.time()
+    scenario.resume(maxIterations = maxIterations)
+    elapsed = time.time() - startTime
+    
+    result = dict()
+    result['numIterations'] = scenario.numIterations
+    result['elapsed'] = elapsed
+    result['loadData'] = scenario.loadData
+    result['bouncerTrace'] = scenario.bouncer.trace if scenario.bouncer else []
+    return branch.name, result
+
+
+class Branch:
+    '''Defines the changes a what-if branch applies to the shared
+    scenario state before it continues: another policy class, a
+    bouncer mode (True for active, False for accept all, see
+    Bouncer.debugSetAcceptAll) and new capacities given as
+    {pool: {resource: capacity}}. Everything not given is kept.
+    '''
+    
+    def __init__(self, name, policy = None, bouncerActive = None, capacities = None):
+        self.name = name
+        self.policy = policy
+        self.bouncerActive = bouncerActive
+        self.capacities = capacities if capacities is not None else dict()
+    
+    def __str__(self):
+        return 'Branch (%s)' % (self.name)
+    
+    def apply(self, scenario):
+        if self.policy is not None:
+            scenario.setPolicy(self.policy)
+        if self.bouncerActive is not None and scenario.bouncer:
+            scenario.bouncer.debugSetAcceptAll(not self.bouncerActive)
+        for resPool in self.capacities:
+            for resource, capacity in self.capacities[resPool].items():
+                scenario.resourcePools[resPool].setCapacity(resource, capacity)
+        if len(self.capacities):
+            # Queued priorities may refer to the former capacities
+            scenario.policy.reset()
+        
+        sink = scenario.loadData.sink
+        if sink is not None:
+            # Each branch continues its own copy of the streamed prefix
+            filename = '%s.%s' % (sink.filename, self.name)
+            shutil.copyfile(sink.filename, filename)
+            sink.filename = filename
+
+
+class WhatIfBranching:
+    '''Defines a what-if analysis that simulates a scenario once up to
+    the branch iteration and then continues the identical state in
+    several branches, each with its own policy, bouncer mode or
+    capacities. Where available, branches run in processes forked
+    from the branch point, so the prefix is shared copy-on-write
+    instead of being simulated again for every alternative. Otherwise
+    each branch continues an in-memory copy of the state.
+    '''
+    
+    def __init__(self, scenario, branchIteration, branches, processes = None):
+        self.scenario = scenario
+        self.branchIteration = branchIteration
+        self.branches = branches
+        self.processes = processes
+        self.results = dict()
+    
+    def __str__(self):
+        return 'WhatIfBranching (iteration %d, %d branches)' % (self.branchIteration, len(self.branches))
+    
+    def run(self, maxIterations = None):
+        global _branchScenario
+        
+        self.scenario.start(maxIterations = self.branchIteration)
+        tasks = [(branch, maxIterations) for branch in self.branches]
+        
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            randomState = random.getstate()
+            for branch in self.branches:
+                random.setstate(randomState)
+                _branchScenario = snsim.checkpoint.copyScenario(self.scenario)
+                name, result = _runBranch((branch, maxIterations))
+                self.results[name] = result
+            _branchScenario = None
+            return self.results
+        
+        # A fresh worker per branch, each forked from the branch point
+        _branchScenario = self.scenario
+        pool = multiprocessing.get_context('fork').Pool(self.processes, maxtasksperchild = 1)
+        try:
+            for name, result in pool.map(_runBranch, tasks, chunksize = 1):
+                self.results[name] = result
+        finally:
+            pool.close()
+            pool.join()
+            _branchScenario = None
+        return self.results
+    
+    def exportTraces(self, reportDirectory):
+        for name in sorted(self.results.keys()):
+            loadData = self.results[name]['loadData']
+            filename = '%s/trace_scenario_whatif_%s.out' % (reportDirectory, name)
+            writer = snsim.trace.TraceWriter(filename, self.scenario.generator)
+            writer.open()
+            writer.write(loadData, loadData.offset, len(loadData))
+            writer.close()
+            print('File \'%s\' written.' % (filename))
@@ -0,0 +1,79 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import io
+import pickle
+import random
+
+VERSION = 1
+
+class CheckpointException(Exception):
+    pass
+
+
+class _CheckpointPickler(pickle.Pickler):
+    # Scenarios without a seed draw from the random module itself, which
+    # cannot be pickled. It is stored as a reference and its state is
+    # saved next to the scenario.
+    def persistent_id(self, obj):
+        if obj is random:
+            return 'random'
+        return None
+
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid == 'random':
+            return random
+        raise pickle.UnpicklingError('Unknown reference \'%s\'.' % (pid))
+
+
+def saveCheckpoint(scenario, filename):
+    '''Writes the complete state of a scenario to filename: resource
+    pool levels, live job and service instances, generator, bouncer,
+    policy and engine state, random number generator and the collected
+    traces. The simulation continues exactly where it stopped when the
+    checkpoint is loaded and resumed, even in another process.
+    '''
+    checkpoint = dict()
+    checkpoint['version'] = VERSION
+    checkpoint['randomState'] = random.getstate()
+    checkpoint['scenario'] = scenario
+    
+    with open(filename, 'wb') as outfile:
+        _CheckpointPickler(outfile, pickle.HIGHEST_PROTOCOL).dump(checkpoint)
+
+def loadCheckpoint(filename):
+    # Returns the scenario stored in filename, ready for Scenario.resume()
+    with open(filename, 'rb') as infile:
+        checkpoint = _CheckpointUnpickler(infile).load()
+    if checkpoint.get('version') != VERSION:
+        raise CheckpointException('\'%s\' has an unsupported checkpoint version.' % (filename))
+    
+    random.setstate(checkpoint['randomState'])
+    return checkpoint['scenario']
+
+def copyScenario(scenario):
+    # Returns an independent in-memory copy of a scenario's state
+    buffer = io.BytesIO()
+    _CheckpointPickler(buffer, pickle.HIGHEST_PROTOCOL).dump(scenario)
+    buffer.seek(0)
+    return _CheckpointUnpickler(buffer).load()
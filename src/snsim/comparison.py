@@ -0,0 +1,129 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import multiprocessing
+import time
+
+import snsim.bouncer
+import snsim.engine
+import snsim.generator
+import snsim.tracefile
+import snsim.xmlloader
+
+def setUpScenario(filename, policy, bouncerActive, engine, cacheDirectory = None):
+    scenario = snsim.xmlloader.XMLScenarioLoader(filename, cacheDirectory).getScenario()
+    scenario.setGenerator(snsim.generator.JobGenerator)
+    scenario.setEngine(engine)
+    if bouncerActive is not None:
+        scenario.setBouncer(snsim.bouncer.Bouncer)
+        scenario.bouncer.debugSetAcceptAll(not bouncerActive)
+    scenario.setPolicy(policy)
+    return scenario
+
+def _runVariant(variant):
+    # Runs in a worker process. Everything handed in and out must be
+    # picklable, so the scenario is loaded from its file in each worker.
+    filename, policy, bouncerActive, maxIterations, engine, reportDirectory, binary, cacheDirectory = variant
+    scenario = setUpScenario(filename, policy, bouncerActive, engine, cacheDirectory)
+    
+    startTime = time.time()
+    scenario.start(maxIterations = maxIterations)
+    elapsed = time.time() - startTime
+    
+    name = _getVariantName(scenario.policy, bouncerActive)
+    if reportDirectory is not None:
+        scenario.exportTrace('%s/trace_scenario_%s.out' % (reportDirectory, name))
+        if binary:
+            scenario.exportBinaryTrace('%s/trace_scenario_%s.trace' % (reportDirectory, name))
+        if scenario.bouncer:
+            scenario.bouncer.exportTrace('%s/trace_bouncer_%s.out' % (reportDirectory, name))
+    
+    result = dict()
+    result['numIterations'] = scenario.numIterations
+    result['elapsed'] = elapsed
+    result['loadData'] = scenario.loadData
+    result['bouncerTrace'] = scenario.bouncer.trace if scenario.bouncer else []
+    return name, result
+
+def _getVariantName(policy, bouncerActive):
+    if bouncerActive is None:
+        return str(policy)
+    return '%s_%s' % (policy, 'active' if bouncerActive else 'inactive')
+
+
+class PolicyComparison:
+    '''Defines a comparison of several policies (and bouncer variants)
+    on the same scenario file. Each variant runs in its own worker
+    process and starts from the same seed, so a comparison of all
+    variants takes about as long as its slowest run if enough cores
+    are available. Bouncer modes are None (no bouncer), False (bouncer
+    that accepts all jobs, but keeps its trace) and True (active bouncer).
+    Workers share compiled scenarios if a cacheDirectory is given (see
+    snsim.xmlloader.XMLScenarioLoader).
+    '''
+    
+    def __init__(self, filename, policies, bouncerModes = None, maxIterations = None, engine = None, processes = None, cacheDirectory = None):
+        self.filename = filename
+        self.policies = policies
+        self.bouncerModes = bouncerModes if bouncerModes is not None else [None]
+        self.maxIterations = maxIterations
+        self.engine = engine if engine is not None else snsim.engine.TickEngine
+        self.processes = processes
+        self.cacheDirectory = cacheDirectory
+        self.results = dict()
+    
+    def __str__(self):
+        return 'PolicyComparison (%s, %d variants)' % (self.filename, len(self.policies) * len(self.bouncerModes))
+    
+    def run(self, reportDirectory = None, binary = False):
+        # With binary set, each variant also writes a binary trace, see getMergedTraces
+        variants = []
+        for policy in self.policies:
+            for bouncerActive in self.bouncerModes:
+                variants.append((self.filename, policy, bouncerActive, self.maxIterations, self.engine, reportDirectory, binary, self.cacheDirectory))
+        
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for name, result in pool.map(_runVariant, variants, chunksize = 1):
+                self.results[name] = result
+        finally:
+            pool.close()
+            pool.join()
+        return self.results
+    
+    def getMergedTraces(self, reportDirectory):
+        filenames = dict()
+        for name in self.results:
+            filenames[name] = '%s/trace_scenario_%s.trace' % (reportDirectory, name)
+        return snsim.tracefile.MergedTraces(filenames)
+    
+    def exportSummary(self, filename):
+        with open(filename, 'w') as outfile:
+            outfile.write('#variant iterations elapsed abrtjobs decljobs bids pentys revenue\n')
+            for name in sorted(self.results.keys()):
+                result = self.results[name]
+                last = result['loadData'][-1] if len(result['loadData']) else None
+                if last is None:
+                    continue
+                outfile.write('%s %d %.4f %d %d %.2f %.2f %.2f\n' % \
+                              (name, result['numIterations'], result['elapsed'], last['abortedJobs'], last['declinedJobs'], \
+                               last['biddings'], last['penalty'], last['biddings'] - last['penalty']))
+            print('File \'%s\' written.' % (filename))
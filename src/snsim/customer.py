@@ -23,12 +23,16 @@ class Customer:
     '''Defines a customer that is referenced by job instances
     as they are created. Holds several customer-related
     properties, such as gold status etc.
+    The share weights the customer when jobs are generated.
     '''
     
-    def __init__(self, identifier, isGold, goldWeight):
+    __slots__ = ('identifier', 'isGold', 'goldWeight', 'share')
+    
+    def __init__(self, identifier, isGold, goldWeight, share = 1.0):
         self.identifier = identifier
         self.isGold = isGold
         self.goldWeight = float(goldWeight)
+        self.share = float(share)
 
     def __str__(self):
         return str(self.identifier)
\ No newline at end of file
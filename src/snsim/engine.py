@@ -0,0 +1,233 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import heapq
+import math
+
+import snsim.timing
+
+class TickEngine:
+    '''Defines the fixed-tick engine that drives a scenario's
+    simulation loop. Each iteration admits new jobs, tries to start
+    all prioritized services, steps every live job instance and
+    collects the system load.
+    '''
+    
+    def __init__(self, scenario):
+        self.name = 'Tick Engine'
+        self.scenario = scenario
+        self.reset()
+    
+    def __str__(self):
+        return str(self.name.replace(' ', '_'))
+    
+    def reset(self):
+        self.iteration = 0
+    
+    def run(self, maxIterations):
+        scenario = self.scenario
+        timer = scenario.timer
+        iteration = self.iteration
+        while iteration < maxIterations:
+            if scenario.checkpoint is not None and iteration >= scenario.checkpoint[1]:
+                self.iteration = iteration
+                scenario.saveCheckpoint(iteration)
+            scenario.admitJobs(iteration)
+            numJobs = len(scenario.jobInstances)
+            
+            timer.enter(snsim.timing.POLICY)
+            prioritizedServiceList = scenario.policy.getPrioritizedServices(scenario.jobInstances)
+            timer.enter(snsim.timing.START)
+            scenario.startServices(iteration, prioritizedServiceList)
+            
+            timer.enter(snsim.timing.STEP)
+            for job in scenario.jobInstances:
+                job.step()
+            scenario.settleJobs(scenario.jobInstances)
+            
+            timer.enter(snsim.timing.LOAD)
+            scenario.endTick(iteration, numJobs, len(prioritizedServiceList))
+            timer.endIteration(scenario.loadData, iteration)
+            iteration += 1
+        self.iteration = iteration
+        return iteration
+
+
+class EventEngine:
+    '''Defines a discrete-event engine that produces the same load
+    and scheduling data as the tick engine, but keeps a heap of
+    service completions and only touches jobs that actually change.
+    A pending service whose demand does not fit the free capacity at
+    the beginning of an iteration cannot start in it, as levels only
+    grow while services are started, so it is only charged its failed
+    attempt instead of being tried. onServiceRejected is only reported
+    for services that are actually tried. Whenever an iteration passes
+    with nothing but failed start attempts, the engine jumps straight
+    to the next iteration that holds a job arrival, a service
+    completion or a retry wake-up (a pending service reaching its
+    maximum number of attempts). The failed attempts of the skipped
+    iterations are charged at once.
+    Running service instances are not stepped down tick by tick, so
+    their ticksLeft is only updated when they finish.
+    '''
+    
+    def __init__(self, scenario):
+        self.name = 'Event Engine'
+        self.scenario = scenario
+        self.reset()
+    
+    def __str__(self):
+        return str(self.name.replace(' ', '_'))
+    
+    def reset(self):
+        self.iteration = 0
+        self.events = []
+        self.sequence = 0
+    
+    def _schedule(self, service, iteration):
+        # A service started in a certain iteration is stepped for the
+        # first time in that very iteration.
+        due = iteration + max(service.ticksLeft, 1) - 1
+        heapq.heappush(self.events, (due, self.sequence, service))
+        self.sequence += 1
+    
+    def _complete(self, iteration):
+        completed = dict()
+        while len(self.events) and self.events[0][0] <= iteration:
+            service = heapq.heappop(self.events)[2]
+            if not service.isRunning:
+                # Service was aborted together with its job
+                continue
+            if service.job not in completed:
+                completed[service.job] = []
+            completed[service.job].append(service)
+        for job in completed:
+            job.finishServices(completed[job])
+        return completed
+    
+    def _startServices(self, iteration, prioritizedServiceList):
+        # Same as Scenario.startServices, but a service that has failed
+        # before is not tried again while its demand exceeds the free
+        # capacity of its pool. Levels only grow while services are
+        # started, so such a service fails anyway and is only charged
+        # its attempt. Services that were never tried, that run out of
+        # attempts or whose job has been aborted are always tried, so
+        # observers see their first rejection and every abort.
+        scenario = self.scenario
+        if not scenario.chargeInfeasibleAttempts:
+            # Whether a service is charged then depends on the whole list
+            return scenario.startServices(iteration, prioritizedServiceList)
+        
+        started = []
+        aborted = set()
+        rejected = []
+        fits = dict()
+        for service in prioritizedServiceList:
+            template = service.template
+            if 0 < service.attempts < template.maxAttempts and not service.job.wasAborted:
+                if template not in fits:
+                    fits[template] = template.resourcePool.canAllocate(template.demand)
+                if not fits[template]:
+                    service.attempts += 1
+                    rejected.append(service)
+                    continue
+            
+            serviceStarted, serviceAborted, serviceRejected = scenario.startServices(iteration, [service])
+            if len(serviceAborted):
+                # Aborted jobs release their resources
+                aborted.update(serviceAborted)
+                fits = dict()
+            elif len(serviceStarted):
+                started.extend(serviceStarted)
+                # Templates that did not fit still do not fit
+                fits = dict([(template, fit) for template, fit in fits.items() if not fit])
+            else:
+                rejected.extend(serviceRejected)
+        return started, aborted, rejected
+    
+    def _getNextEventIteration(self, iteration, maxIterations, rejectedServices):
+        nextIteration = maxIterations
+        if self.scenario.checkpoint is not None:
+            # Checkpoints are taken at their very iteration
+            nextIteration = min(nextIteration, max(self.scenario.checkpoint[1], iteration))
+        if len(self.events):
+            nextIteration = min(nextIteration, self.events[0][0])
+        if self.scenario.generator is not None:
+            nextIteration = self.scenario.generator.getNextArrivalIteration(iteration, nextIteration)
+        for service in rejectedServices:
+            attemptsLeft = max(service.template.maxAttempts - service.attempts, 0)
+            nextIteration = min(nextIteration, iteration + int(math.ceil(attemptsLeft)))
+        return nextIteration
+    
+    def run(self, maxIterations):
+        scenario = self.scenario
+        timer = scenario.timer
+        touched = set(scenario.jobInstances)
+        iteration = self.iteration
+        while iteration < maxIterations:
+            if scenario.checkpoint is not None and iteration >= scenario.checkpoint[1]:
+                self.iteration = iteration
+                scenario.saveCheckpoint(iteration)
+            touched.update(scenario.admitJobs(iteration))
+            numJobs = len(scenario.jobInstances)
+            
+            timer.enter(snsim.timing.POLICY)
+            prioritizedServiceList = scenario.policy.getPrioritizedServices(scenario.jobInstances)
+            timer.enter(snsim.timing.START)
+            started, aborted, rejected = self._startServices(iteration, prioritizedServiceList)
+            for service in started:
+                self._schedule(service, iteration)
+            touched.update(aborted)
+            
+            timer.enter(snsim.timing.STEP)
+            completed = self._complete(iteration)
+            touched.update(completed)
+            settled = scenario.settleJobs(touched)
+            touched = set()
+            
+            timer.enter(snsim.timing.LOAD)
+            scenario.endTick(iteration, numJobs, len(prioritizedServiceList))
+            timer.endIteration(scenario.loadData, iteration)
+            iteration += 1
+            
+            if len(started) or len(completed) or len(settled):
+                continue
+            
+            # Nothing but failed start attempts happened, so the system
+            # state stays the same until the next event is due.
+            nextIteration = self._getNextEventIteration(iteration, maxIterations, rejected)
+            for service in rejected:
+                service.attempts += nextIteration - iteration
+            if scenario.bouncer and scenario.generator is not None:
+                # The bouncer has to watch the load of every iteration
+                while iteration < nextIteration:
+                    scenario.admitJobs(iteration)
+                    timer.enter(snsim.timing.LOAD)
+                    scenario.repeatTicks(iteration, 1)
+                    timer.endIteration(scenario.loadData, iteration)
+                    iteration += 1
+            else:
+                timer.enter(snsim.timing.LOAD)
+                scenario.repeatTicks(iteration, nextIteration - iteration)
+                timer.endIteration(scenario.loadData, iteration)
+                iteration = nextIteration
+        self.iteration = iteration
+        return iteration
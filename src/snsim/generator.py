@@ -21,40 +21,246 @@
 
 import random
 import math
+import numpy
 import snsim.job
 
+class SineArrivals:
+    '''Defines the original deterministic arrival curve, a sine
+    wave of period 20*pi iterations between 0 and 5 new jobs.
+    '''
+    
+    def reset(self):
+        pass
+    
+    def getAmounts(self, start, count, rng):
+        # Computed element-wise with math.sin, so the amounts are exactly
+        # those of former versions.
+        amounts = numpy.zeros(count, dtype = numpy.int64)
+        for i in range(count):
+            amounts[i] = max(int((math.sin((start + i) * 0.1) + 1.0) * 2.5), 0)
+        return amounts
+    
+    def __str__(self):
+        return 'Sine'
+
+
+class PoissonArrivals:
+    '''Defines Poisson arrivals with a constant mean rate
+    of new jobs per iteration.
+    '''
+    
+    def __init__(self, rate):
+        self.rate = float(rate)
+    
+    def reset(self):
+        pass
+    
+    def getAmounts(self, start, count, rng):
+        return rng.poisson(self.rate, count)
+    
+    def __str__(self):
+        return 'Poisson(%.2f)' % (self.rate)
+
+
+class DiurnalArrivals:
+    '''Defines Poisson arrivals whose rate follows a daily profile,
+    i.e. a sine wave around the mean rate with the given relative
+    amplitude and a period of one day in iterations.
+    '''
+    
+    def __init__(self, rate, amplitude = 0.5, period = 1440, phase = 0):
+        self.rate = float(rate)
+        self.amplitude = float(amplitude)
+        self.period = int(period)
+        self.phase = int(phase)
+    
+    def reset(self):
+        pass
+    
+    def getAmounts(self, start, count, rng):
+        iterations = numpy.arange(start, start + count) + self.phase
+        rates = self.rate * (1.0 + self.amplitude * numpy.sin(2.0 * math.pi * iterations / self.period))
+        return rng.poisson(numpy.maximum(rates, 0.0))
+    
+    def __str__(self):
+        return 'Diurnal(%.2f, %.2f, %d)' % (self.rate, self.amplitude, self.period)
+
+
+class MMPPArrivals:
+    '''Defines a Markov-modulated Poisson process for bursty
+    arrivals. In each state, new jobs arrive with the state's rate and
+    the process leaves the state with its switch probability per
+    iteration, moving to the next state (cyclically). The default is
+    a calm state and a burst state.
+    '''
+    
+    def __init__(self, rates = (1.0, 8.0), switchProbabilities = (0.02, 0.1)):
+        if len(rates) != len(switchProbabilities):
+            raise ValueError('Every state needs a rate and a switch probability.')
+        self.rates = numpy.array(rates, dtype = numpy.float64)
+        self.switchProbabilities = numpy.array(switchProbabilities, dtype = numpy.float64)
+        self.reset()
+    
+    def reset(self):
+        self.state = 0
+        self.remaining = None
+    
+    def getAmounts(self, start, count, rng):
+        # Draws the sojourn times of the states passed in this window and
+        # the arrivals of all iterations at once. A sojourn that does not
+        # end in the window is continued by the next one.
+        states = numpy.zeros(count, dtype = numpy.int64)
+        position = 0
+        while position < count:
+            if self.remaining is None:
+                self.remaining = int(rng.geometric(self.switchProbabilities[self.state]))
+            length = min(self.remaining, count - position)
+            states[position:position + length] = self.state
+            position += length
+            self.remaining -= length
+            if self.remaining == 0:
+                self.state = (self.state + 1) % len(self.rates)
+                self.remaining = None
+        return rng.poisson(self.rates[states])
+    
+    def __str__(self):
+        return 'MMPP(%s)' % (', '.join('%.2f' % rate for rate in self.rates))
+
+
 class JobGenerator:
     '''Defines a class that generates new jobs dependent on
     the current iteration step.
+    The number of new jobs per iteration is given by an arrival
+    process (the sine curve of former versions by default), which is
+    asked for a whole window of iterations at once. The templates and
+    customers of all jobs of a window are drawn in one batch, too,
+    weighted by their shares (see the Share element of job templates
+    and customers). Both draws use their own numpy generators, seeded
+    from the scenario's random object, so the jobs of an iteration do
+    not depend on how far ahead an engine has looked for arrivals.
     '''
     
-    def __init__(self, jobTemplates, customers, randomizer = None):
+    def __init__(self, jobTemplates, customers, randomizer = None, arrivals = None, windowSize = 256):
         self.jobTemplates = jobTemplates
         self.customers = customers
+        self.windowSize = windowSize
+        self.arrivals = SineArrivals() if arrivals is None else arrivals
         
         if randomizer is None:
             self.random = random
         else:
             self.random = randomizer
         
+        self.templateKeys, self.templateShares = self._getShares(jobTemplates)
+        self.customerKeys, self.customerShares = self._getShares(customers)
+        
         self.reset()
     
+    def _getShares(self, objects):
+        # Returns the keys and the cumulative shares used to draw from them
+        keys = list(objects.keys())
+        shares = numpy.array([objects[k].share for k in keys], dtype = numpy.float64)
+        if len(keys) and (numpy.any(shares < 0.0) or shares.sum() <= 0.0):
+            raise ValueError('Shares must not be negative and must not all be zero.')
+        shares = numpy.cumsum(shares)
+        if len(keys):
+            shares /= shares[-1]
+        return keys, shares
+    
+    def _getGenerators(self):
+        if self.arrivalRandom is None:
+            seed = numpy.random.SeedSequence(self.random.getrandbits(64))
+            self.arrivalRandom, self.choiceRandom = [numpy.random.default_rng(s) for s in seed.spawn(2)]
+        return self.arrivalRandom, self.choiceRandom
+    
+    def _drawAmounts(self, stop):
+        # Draws the arrivals of whole windows until iteration stop is covered
+        while self.drawn < stop:
+            amounts = self.arrivals.getAmounts(self.drawn, self.windowSize, self._getGenerators()[0])
+            if self.drawn + self.windowSize > len(self.amounts):
+                grown = numpy.zeros(max(2 * len(self.amounts), self.drawn + self.windowSize), dtype = numpy.int64)
+                grown[:self.drawn] = self.amounts[:self.drawn]
+                self.amounts = grown
+            self.amounts[self.drawn:self.drawn + self.windowSize] = amounts
+            self.drawn += self.windowSize
+    
+    def _drawWindow(self, window):
+        # Draws templates and customers of all jobs of the given window
+        # and of any window skipped before it
+        choiceRandom = self._getGenerators()[1]
+        while self.window < window:
+            self.window += 1
+            start = self.window * self.windowSize
+            self._drawAmounts(start + self.windowSize)
+            amounts = self.amounts[start:start + self.windowSize]
+            self.windowOffsets = numpy.zeros(self.windowSize + 1, dtype = numpy.int64)
+            numpy.cumsum(amounts, out = self.windowOffsets[1:])
+            total = int(self.windowOffsets[-1])
+            self.windowTemplates = numpy.searchsorted(self.templateShares, choiceRandom.random(total), side = 'right')
+            self.windowCustomers = numpy.searchsorted(self.customerShares, choiceRandom.random(total), side = 'right')
+    
     def _getAmountByIteration(self, iteration):
-        val = int((math.sin(iteration * 0.1) + 1.0) * 2.5)
-        return val if val > 0 else 0
+        if iteration >= self.drawn:
+            self._drawAmounts(iteration + 1)
+        return int(self.amounts[iteration])
     
     def reset(self):
         self.nextJobId = 0
+        self.arrivals.reset()
+        self.arrivalRandom = None
+        self.choiceRandom = None
+        self.amounts = numpy.zeros(0, dtype = numpy.int64)
+        self.drawn = 0
+        self.window = -1
+        self.windowOffsets = None
+        self.windowTemplates = None
+        self.windowCustomers = None
+    
+    def getNextArrivalIteration(self, iteration, maxIterations):
+        # Returns the first iteration (not before the given one) in which
+        # new jobs will be generated, or maxIterations if there is none.
+        while iteration < maxIterations:
+            if iteration >= self.drawn:
+                self._drawAmounts(iteration + 1)
+            stop = min(self.drawn, maxIterations)
+            arrivals = numpy.flatnonzero(self.amounts[iteration:stop])
+            if len(arrivals):
+                return iteration + int(arrivals[0])
+            iteration = stop
+        return iteration
+    
+    def discardAmounts(self, iteration):
+        # Called once the amounts of the iterations before the given one
+        # will not be asked for again. Drawn amounts are kept.
+        pass
+    
+    def setArrivalProcess(self, arrivals):
+        self.arrivals = arrivals
+        self.reset()
     
     def setRandomObject(self, randomizer):
+        # Seeds the numpy generators right away, so they do not depend
+        # on when the engine first asks for arrivals
         self.random = randomizer
+        self.arrivalRandom = None
+        self._getGenerators()
     
     def getNewJobInstances(self, iteration):
         instances = set()
-        for id in xrange(0, self._getAmountByIteration(iteration)):
-            randomJobTemplate = self.jobTemplates[self.random.choice([k for k in self.jobTemplates.keys()])]
-            randomCustomer = self.customers[self.random.choice([k for k in self.customers.keys()])]
-            instances.add(snsim.job.JobInstance(self.nextJobId, randomJobTemplate, randomCustomer))
+        window, index = divmod(iteration, self.windowSize)
+        if window > self.window:
+            self._drawWindow(window)
+        elif window < self.window:
+            raise ValueError('Jobs of iteration %d have already been generated.' % (iteration))
+        
+        start, stop = self.windowOffsets[index], self.windowOffsets[index + 1]
+        for template, customer in zip(self.windowTemplates[start:stop], self.windowCustomers[start:stop]):
+            instances.add(snsim.job.JobInstance(self.nextJobId,
+                                                self.jobTemplates[self.templateKeys[template]],
+                                                self.customers[self.customerKeys[customer]]))
             self.nextJobId += 1
         
-        return instances
\ No newline at end of file
+        return instances
+    
+    def __str__(self):
+        return str(self.arrivals)
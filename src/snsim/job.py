@@ -19,6 +19,9 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
 # IN THE SOFTWARE.
 
+import ast
+import re
+
 import snsim.service
 import snsim.resourcepool
 
@@ -26,36 +29,129 @@ class JobTemplate:
     '''Defines a possible constellation of services and holds 
     revenue and penalty due on completion of an instanced job
     based on this template.
+    The signature is compiled into a dependency graph with one node
+    per service: predecessorCounts holds the number of services each
+    node waits for and successors the nodes that wait for it. Job
+    instances make a service pending as soon as all of its own
+    predecessors have finished (see parseSignature for the formats).
+    The share weights the template when jobs are generated.
     '''
     
-    def __init__(self, identifier, scenario, signature, revenue, penalty):
+    def __init__(self, identifier, scenario, signature, revenue, penalty, share = 1.0):
         self.identifier = identifier
         self.scenario = scenario
+        self.servicePool = None
+        # Set by the scenario if observers want to know of finished services
+        self.finishHook = None
         
         self.revenue = revenue
         self.penalty = penalty
+        self.share = float(share)
         
-        try:
-            self.signature = eval(signature)
-        except SyntaxError:
-            raise InvalidSignatureFormatException
+        # Signatures may be handed in already parsed (see the loader's cache)
+        if isinstance(signature, str):
+            signature = parseSignature(signature)
+        self.signature = signature
         
-        sequence = [set(part) for part in self.signature]
-        for subset in sequence:
-            for element in subset:
-                if len(element) != 1:
-                    raise TooManyNestedScopesException(element)
-                if element not in self.scenario.serviceTemplates:
-                    raise InvalidServiceReferenceException(element)
+        self.serviceCount = len(self.signature)
+        self.serviceTemplates = []
+        self.predecessorCounts = []
+        self.successors = [[] for node in range(self.serviceCount)]
+        self.depths = []
+        self.roots = []
+        for node, (serviceIdentifier, predecessors) in enumerate(self.signature):
+            if serviceIdentifier not in self.scenario.serviceTemplates:
+                raise InvalidServiceReferenceException(serviceIdentifier)
+            self.serviceTemplates.append(self.scenario.serviceTemplates[serviceIdentifier])
+            self.predecessorCounts.append(len(predecessors))
+            # Length of the longest chain of services before the node,
+            # which equals the tuple index for the tuple format
+            depth = 0
+            for predecessor in predecessors:
+                self.successors[predecessor].append(node)
+                depth = max(depth, self.depths[predecessor] + 1)
+            self.depths.append(depth)
+            if not len(predecessors):
+                self.roots.append(node)
     
     def __str__(self):
         return self.identifier
     
+def parseSignature(signature):
+    '''Parses a signature into a list of (service identifier,
+    predecessor indices) pairs in which predecessors always come first.
+    Two formats are accepted. The tuple format, e.g.
+    "((\'A\', \'B\'), (\'C\',))", is a sequence of tuples of single-letter
+    service identifiers, where every service of a tuple waits for all
+    services of the previous one. It is read as a literal, never
+    evaluated. The dependency format lists one service per entry,
+    separated by semicolons or line breaks, each optionally followed by
+    the services it waits for, e.g. "A; B; C <- A; D <- B, C". Entries
+    may be labelled to use a service more than once, e.g. "x:A; y:A <- x".
+    Dependencies refer to labels (the identifier by default) of
+    earlier entries, so the graph cannot contain cycles.
+    '''
+    if signature.strip().startswith('('):
+        return _parseTuples(signature)
+    return _parseDependencies(signature)
+
+def _parseTuples(signature):
+    try:
+        sequence = ast.literal_eval(signature.strip())
+    except (SyntaxError, ValueError):
+        raise InvalidSignatureFormatException
+    if isinstance(sequence, str) or not isinstance(sequence, (tuple, list)):
+        raise InvalidSignatureFormatException
+    
+    nodes = []
+    previous = ()
+    for part in sequence:
+        # A tuple written without a trailing comma, e.g. ('C'), is a string
+        if not isinstance(part, (str, tuple, list)):
+            raise InvalidSignatureFormatException
+        current = []
+        for element in part:
+            if not isinstance(element, str) or len(element) != 1:
+                raise TooManyNestedScopesException(element)
+            current.append(len(nodes))
+            nodes.append((element, previous))
+        if len(current):
+            previous = tuple(current)
+    return nodes
+
+IDENTIFIER = re.compile(r'^[\w.\-]+$')
+
+def _parseDependencies(signature):
+    nodes = []
+    labels = dict()
+    for entry in signature.replace('\n', ';').split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        dependencies = []
+        if '<-' in entry:
+            entry, dependencyList = entry.split('<-', 1)
+            dependencies = [label.strip() for label in dependencyList.split(',')]
+        label = serviceIdentifier = entry.strip()
+        if ':' in label:
+            label, serviceIdentifier = [part.strip() for part in label.split(':', 1)]
+        if not IDENTIFIER.match(label) or not IDENTIFIER.match(serviceIdentifier) or label in labels:
+            raise InvalidSignatureFormatException(entry)
+        
+        predecessors = set()
+        for dependency in dependencies:
+            if dependency not in labels:
+                raise InvalidSignatureFormatException(dependency)
+            predecessors.add(labels[dependency])
+        labels[label] = len(nodes)
+        nodes.append((serviceIdentifier, tuple(sorted(predecessors))))
+    return nodes
+
 class InvalidSignatureFormatException(Exception):
     '''Raised when a given job signature description has and
-    invalid syntax. E.g. missing brackets or quotes.
-    A valid signature format is a string that defines
-    tuples of service identifiers in python style.
+    invalid syntax. E.g. missing brackets or quotes, or a
+    dependency on a service that is not listed before.
+    See parseSignature for the valid formats.
     '''
     pass
 
@@ -84,14 +180,15 @@ class JobInstance:
     and based on the current progress within the signature.
     '''
     
+    __slots__ = ('identifier', 'template', 'customer', 'serviceCount', 'revision', 'progress', 'isFinished', 'wasAborted', 
+                 'waiting', 'finishedCount', 'runningServices', 'pendingServices')
+    
     def __init__(self, identifier, template, customer):
         self.identifier = identifier
         self.template = template
         self.customer = customer
         
-        self.serviceCount = 0
-        for tuple in self.template.signature:
-            self.serviceCount += len(tuple)
+        self.serviceCount = self.template.serviceCount
         
         self.reset()
     
@@ -99,28 +196,47 @@ class JobInstance:
         return str(self.identifier)
     
     def reset(self):
+        # The revision is increased whenever the pending services or
+        # the progress of the job change, so policies can keep track.
+        self.revision = 0
         self.isFinished = False
         self.wasAborted = False
-        self.currentTuple = None
+        self.progress = 0.0
         
+        # Number of unfinished predecessors per signature node
+        self.waiting = list(self.template.predecessorCounts)
+        self.finishedCount = 0
         self.runningServices = set()
         self.pendingServices = set()
-        self.finishedServices = set()
         
-        self._proceed()
+        if self.serviceCount == 0:
+            self._finish()
+        else:
+            self._addPendingServices(self.template.roots)
     
     def getPendingServices(self):
         return self.pendingServices
     
-    def startService(self, service):
+    def tryStartService(self, service):
+        # Same as startService, but returns a status code (see
+        # snsim.service) instead of raising an exception
         if service not in self.pendingServices:
-            raise ServiceNotPendingException
-        try:
-            service.start()
+            return snsim.service.NOT_PENDING
+        status = service.tryStart()
+        if status == snsim.service.STARTED:
             self.runningServices.add(service)
             self.pendingServices.remove(service)
-        except snsim.resourcepool.ResourceCapacityExceededException as rce:
-            raise snsim.resourcepool.ResourceCapacityExceededException(str(rce))
+            self.revision += 1
+        return status
+    
+    def startService(self, service):
+        status = self.tryStartService(service)
+        if status == snsim.service.NOT_PENDING:
+            raise ServiceNotPendingException
+        if status == snsim.service.MAX_ATTEMPTS_REACHED:
+            raise snsim.service.MaxAttemptsReachedException
+        if status == snsim.service.NO_CAPACITY:
+            raise snsim.resourcepool.ResourceCapacityExceededException(str(service.template.identifier))
     
     def step(self):
         if self.isFinished == True:
@@ -131,46 +247,75 @@ class JobInstance:
             service.step()
             if service.isRunning == False:
                 clear.add(service)
-        for service in clear:
-            self.finishedServices.add(service)
-            self.runningServices.remove(service)
-        self._proceed() 
-
-    def _proceed(self):
-        if len(self.runningServices) != 0 or len(self.pendingServices - self.finishedServices) != 0:
+        self._retire(clear)
+    
+    def finishServices(self, services):
+        # Finishes the given running services at once instead of
+        # stepping them down tick by tick (see snsim.engine.EventEngine).
+        if self.isFinished == True:
             return
         
-        self.currentTuple = 0 if self.currentTuple == None else self.currentTuple + 1
-        self.runningServices.clear()
-        self.pendingServices.clear()
-        self.finishedServices.clear()
-        try:
-            for serviceIdentifier in self.template.signature[self.currentTuple]:
-                self.pendingServices.add(snsim.service.ServiceInstance(self.template.scenario.serviceTemplates[serviceIdentifier], self))
-        except IndexError:
+        for service in services:
+            service.finish()
+        self._retire(services)
+    
+    def _retire(self, services):
+        if not len(services):
+            return
+        
+        ready = []
+        successors = self.template.successors
+        for service in services:
+            self.runningServices.remove(service)
+            for node in successors[service.node]:
+                self.waiting[node] -= 1
+                if self.waiting[node] == 0:
+                    ready.append(node)
+        self.finishedCount += len(services)
+        self.revision += 1
+        
+        if self.template.finishHook is not None:
+            self.template.finishHook(self, services)
+        if self.template.servicePool is not None:
+            self.template.servicePool.release(services)
+        if self.finishedCount == self.serviceCount:
             self._finish()
+            return
+        self._addPendingServices(ready)
+        self._updateProgress()
+    
+    def _addPendingServices(self, nodes):
+        servicePool = self.template.servicePool
+        serviceTemplates = self.template.serviceTemplates
+        for node in nodes:
+            if servicePool is not None:
+                self.pendingServices.add(servicePool.acquire(serviceTemplates[node], self, node))
+            else:
+                self.pendingServices.add(snsim.service.ServiceInstance(serviceTemplates[node], self, node))
+        if len(nodes):
+            self.revision += 1
 
     def _finish(self):
         self.isFinished = True
+        self.progress = 1.0
+        self.revision += 1
         
         for service in self.runningServices:
             service.abort()
         
         self.runningServices.clear()
         self.pendingServices.clear()
-        self.finishedServices.clear()
 
-    def getProgress(self):
+    def _updateProgress(self):
         if self.isFinished == True:
-            return 1.0
+            self.progress = 1.0
+            return
         
-        finishedServiceCount = 0
-        for index, tuple in enumerate(self.template.signature):
-            if index < self.currentTuple:
-                finishedServiceCount += len(tuple)
-            if index == self.currentTuple:
-                finishedServiceCount += len(self.finishedServices)
-        return (float(finishedServiceCount) / float(self.serviceCount))
+        self.progress = float(self.finishedCount) / float(self.serviceCount)
+    
+    def getProgress(self):
+        # Kept up to date whenever services finish or the job proceeds
+        return self.progress
 
     def abort(self):
         self.wasAborted = True
@@ -0,0 +1,195 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import collections
+
+EVENTS = ('onJobAccepted', 'onJobDeclined', 'onServiceStarted', 'onServiceRejected', 'onServiceFinished',
+          'onJobAborted', 'onJobFinished', 'onTickEnd', 'onTicksRepeated')
+
+class Observer:
+    '''Defines the interface of observers that a scenario notifies of
+    what happens during a simulation (see Scenario.addObserver).
+    Subclasses override the events they are interested in, all others
+    are never called, so unused events cost nothing.
+    
+    onTicksRepeated marks iterations in which the engine knows the
+    system state did not change (see snsim.engine.EventEngine); they
+    stand in for count further calls of onTickEnd with the last values.
+    Service instances may be recycled once their event returns (see
+    Scenario.setServicePool), so observers should not keep them.
+    '''
+    
+    def reset(self, scenario):
+        # Called whenever the scenario starts a new simulation
+        pass
+    
+    def close(self):
+        # Called when a simulation run ends
+        pass
+    
+    def onJobAccepted(self, iteration, job):
+        pass
+    
+    def onJobDeclined(self, iteration, job):
+        pass
+    
+    def onServiceStarted(self, iteration, service):
+        pass
+    
+    def onServiceRejected(self, iteration, service):
+        # The service could not be started: no capacity, maximum number
+        # of attempts reached (followed by onJobAborted) or not pending.
+        # The event engine leaves out repeated rejections of services
+        # that cannot fit (see snsim.engine.EventEngine).
+        pass
+    
+    def onServiceFinished(self, iteration, service):
+        pass
+    
+    def onJobAborted(self, iteration, job):
+        pass
+    
+    def onJobFinished(self, iteration, job):
+        # Only called for jobs that were not aborted
+        pass
+    
+    def onTickEnd(self, iteration, numJobs, numServices):
+        pass
+    
+    def onTicksRepeated(self, iteration, count):
+        pass
+
+
+def getHooks(observers):
+    # Returns the bound methods to call per event, leaving out those
+    # that an observer does not override
+    hooks = dict()
+    for event in EVENTS:
+        hooks[event] = []
+        for observer in observers:
+            if getattr(type(observer), event) is not getattr(Observer, event):
+                hooks[event].append(getattr(observer, event))
+    return hooks
+
+
+def getJobIndex(job):
+    return '%03d' % (job.identifier)
+
+
+class LoadCollector(Observer):
+    '''Defines the collector of the scenario's load trace (see
+    snsim.trace.LoadTrace). The bouncer decides on the load collected,
+    so a scenario with bouncer always keeps this collector.
+    '''
+    
+    def __init__(self):
+        self.scenario = None
+        self.trace = None
+    
+    def reset(self, scenario):
+        self.scenario = scenario
+        self.trace = scenario._createLoadTrace()
+    
+    def close(self):
+        self.trace.close()
+    
+    def onTickEnd(self, iteration, numJobs, numServices):
+        scenario = self.scenario
+        resourceLoads = []
+        for resPool in scenario.resourcePools:
+            pool = scenario.resourcePools[resPool]
+            for level, capacity in zip(pool.levels, pool.capacities):
+                resourceLoads.append(float(level) / float(capacity))
+        self.trace.append(numJobs, numServices, scenario.abortedJobs, scenario.declinedJobs, \
+                          scenario.sumBiddings, scenario.sumPenalty, resourceLoads)
+    
+    def onTicksRepeated(self, iteration, count):
+        self.trace.repeat(count)
+
+
+class ScheduleCollector(Observer):
+    '''Defines the collector of the scheduling data plotted by
+    Scenario.plotScheduling: for every job, the services it tried to
+    start (keyed by their depth in the signature and their template,
+    plus the signature node if the template is used more than once at
+    that depth)
+    with the iteration and duration of each start.
+    '''
+    
+    def __init__(self):
+        self.scheduleData = None
+        self.starts = None
+        self.repeated = None
+    
+    def reset(self, scenario):
+        self.scheduleData = dict()
+        # Lists of starts by job identifier and signature node, so
+        # services that are rejected again need no lookup by name
+        self.starts = dict()
+        self.repeated = dict()
+    
+    def _getRepeated(self, jobTemplate):
+        # Depths and identifiers of the service templates used by
+        # several nodes at the same depth
+        if jobTemplate not in self.repeated:
+            counts = collections.Counter(zip(jobTemplate.depths, [template.identifier for template in jobTemplate.serviceTemplates]))
+            self.repeated[jobTemplate] = set([entry for entry in counts if counts[entry] > 1])
+        return self.repeated[jobTemplate]
+    
+    def _getStarts(self, service):
+        key = (service.job.identifier, service.node)
+        if key in self.starts:
+            return self.starts[key]
+        jobIndex = getJobIndex(service.job)
+        jobTemplate = service.job.template
+        depth = jobTemplate.depths[service.node]
+        if (depth, service.template.identifier) in self._getRepeated(jobTemplate):
+            serviceIndex = '(%s,%s,%d)' % (depth, service.template.identifier, service.node)
+        else:
+            serviceIndex = '(%s,%s)' % (depth, service.template.identifier)
+        if jobIndex not in self.scheduleData:
+            self.scheduleData[jobIndex] = dict()
+        if serviceIndex not in self.scheduleData[jobIndex]:
+            self.scheduleData[jobIndex][serviceIndex] = list()
+        self.starts[key] = self.scheduleData[jobIndex][serviceIndex]
+        return self.starts[key]
+    
+    def onServiceStarted(self, iteration, service):
+        self._getStarts(service).append((iteration, service.template.ticks))
+    
+    def onServiceRejected(self, iteration, service):
+        if (service.job.identifier, service.node) not in self.starts:
+            self._getStarts(service)
+
+
+class AbortCollector(Observer):
+    '''Defines the collector of the iteration in which each aborted
+    job was aborted, marked in Scenario.plotScheduling.
+    '''
+    
+    def __init__(self):
+        self.aborts = None
+    
+    def reset(self, scenario):
+        self.aborts = dict()
+    
+    def onJobAborted(self, iteration, job):
+        self.aborts[getJobIndex(job)] = iteration
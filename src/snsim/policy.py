@@ -19,6 +19,106 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
 # IN THE SOFTWARE.
 
+import bisect
+import operator
+
+class ServiceQueue:
+    '''Defines a persistent priority queue of the pending services of
+    a set of job instances. Entries are only (re-)keyed when the stamp
+    of their job changes, i.e. when services become pending, start or
+    change their priority, instead of rebuilding and sorting the whole
+    list in every iteration. Keys are tuples that are sorted ascending,
+    or descending if reverse is set.
+    
+    Keys must be unique among all queued services, e.g. by ending with
+    the job identifier and the service's node, so that they fully order
+    the services. Otherwise the order of equal keys would depend on
+    when services were queued, and runs with the same seed could differ.
+    A key that is already taken raises AmbiguousPriorityKeyException.
+    '''
+    
+    def __init__(self, getKey, getStamp, reverse):
+        self.getKey = getKey
+        self.getStamp = getStamp
+        self.reverse = reverse
+        
+        self.stamps = dict()
+        self.jobServices = dict()
+        self.entries = dict()
+        self.owners = dict()
+        self.keys = set()
+        self.ordered = []
+        self.services = []
+        self.sequence = 0
+    
+    def _removeService(self, service, removed):
+        entry = self.entries.pop(service)
+        self.keys.remove(entry[0])
+        removed.append(entry)
+        del self.owners[service]
+    
+    def _updateJob(self, job, added, removed):
+        # Service instances may be recycled by another job, so entries
+        # are only removed by the job that currently owns them.
+        tracked = self.jobServices.pop(job, set())
+        pending = job.getPendingServices()
+        for service in tracked:
+            if service not in pending and self.owners.get(service) is job:
+                self._removeService(service, removed)
+        # Pending services are a set hashed by identity, so they are
+        # queued by node to number them independently of memory layout
+        for service in sorted(pending, key = operator.attrgetter('node')):
+            key = self.getKey(service)
+            if service in self.entries:
+                if self.owners[service] is job and self.entries[service][0] == key:
+                    continue
+                self._removeService(service, removed)
+            if key in self.keys:
+                raise AmbiguousPriorityKeyException(str(key))
+            self.keys.add(key)
+            entry = (key, self.sequence, service)
+            self.sequence += 1
+            self.entries[service] = entry
+            self.owners[service] = job
+            added.append(entry)
+        self.jobServices[job] = set(pending)
+    
+    def _dropJob(self, job, removed):
+        for service in self.jobServices.pop(job):
+            if self.owners.get(service) is job:
+                self._removeService(service, removed)
+        del self.stamps[job]
+    
+    def update(self, jobInstances):
+        added = []
+        removed = []
+        for job in [job for job in self.stamps if job not in jobInstances]:
+            self._dropJob(job, removed)
+        for job in jobInstances:
+            stamp = self.getStamp(job)
+            if job not in self.stamps or self.stamps[job] != stamp:
+                self._updateJob(job, added, removed)
+                self.stamps[job] = stamp
+        
+        if not len(added) and not len(removed):
+            return self.services
+        
+        if len(added) + len(removed) > len(self.ordered) // 8:
+            # Sorting everything is cheaper than many single updates
+            self.ordered = sorted(self.entries.values())
+        else:
+            for entry in removed:
+                del self.ordered[bisect.bisect_left(self.ordered, entry)]
+            for entry in added:
+                bisect.insort(self.ordered, entry)
+        
+        if self.reverse:
+            self.services = [entry[2] for entry in reversed(self.ordered)]
+        else:
+            self.services = [entry[2] for entry in self.ordered]
+        return self.services
+
+
 class FCFSPolicy:
     '''Defines a first-come first-serve style policy.
     It will not prioritize services but rather return them
@@ -29,17 +129,22 @@ class FCFSPolicy:
     def __init__(self, parameters):
         self.name = 'FCFS Policy'
         self.parameters = parameters
+        self.reset()
     
     def __str__(self):
         return str(self.name.replace(' ', '_'))
     
+    def reset(self):
+        self.queue = ServiceQueue(self._getPriorityKey, self._getStamp, reverse = False)
+    
+    def _getStamp(self, job):
+        return job.revision
+    
+    def _getPriorityKey(self, service):
+        return (service.job.identifier, str(service.template.identifier), service.node)
+    
     def getPrioritizedServices(self, jobInstances):
-        services = []
-        for job in jobInstances:
-            for service in job.getPendingServices():
-                services.append(service)
-        services.sort(key = lambda service: '%04d%s' % (service.job.identifier, str(service.template.identifier)))
-        return services
+        return self.queue.update(jobInstances)
 
 
 class RatioBasedPolicy:
@@ -51,24 +156,29 @@ class RatioBasedPolicy:
     def __init__(self, parameters):
         self.name = 'Ratio-Based Policy'
         self.parameters = parameters
+        self.reset()
     
     def __str__(self):
         return str(self.name.replace(' ', '_'))
     
+    def reset(self):
+        # Keys depend on pool capacities, so reset the policy
+        # whenever capacities are changed during a simulation.
+        self.queue = ServiceQueue(self._getPriorityKey, self._getStamp, reverse = True)
+    
+    def _getStamp(self, job):
+        return job.revision
+    
+    def _getPriorityKey(self, service):
+        quota = []
+        for resource in service.template.resources:
+            if service.template.resourcePool.getCapacity(resource) is not None:
+                quota.append(float(service.template.resources[resource]) / float(service.template.resourcePool.getCapacity(resource)))
+        priorityKey = float(sum(quota)) / float(len(quota))
+        return (round(priorityKey, 2), service.job.identifier, str(service.template.identifier), service.node)
+    
     def getPrioritizedServices(self, jobInstances):
-        pending = []
-        prioritized = []
-        for job in jobInstances:
-            for service in job.getPendingServices():
-                quota = []
-                for resource in service.template.resources:
-                    if service.template.resourcePool.getCapacity(resource) is not None:
-                        quota.append(float(service.template.resources[resource]) / float(service.template.resourcePool.getCapacity(resource)))
-                priorityKey = float(sum(quota)) / float(len(quota))
-                pending.append((priorityKey, service))
-        for service in sorted(pending, key = lambda tuple: '%012.2f %04d %s' % (tuple[0], tuple[1].job.identifier, tuple[1]), reverse = True):
-            prioritized.append(service[1])
-        return prioritized
+        return self.queue.update(jobInstances)
 
 
 class RevenueBasedPolicy:
@@ -81,20 +191,24 @@ class RevenueBasedPolicy:
     def __init__(self, parameters):
         self.name = 'Revenue-Based Policy'
         self.parameters = parameters
+        self.reset()
     
     def __str__(self):
         return str(self.name.replace(' ', '_'))
     
+    def reset(self):
+        self.queue = ServiceQueue(self._getPriorityKey, self._getStamp, reverse = True)
+    
+    def _getStamp(self, job):
+        return job.revision
+    
+    def _getPriorityKey(self, service):
+        job = service.job
+        priorityKey = job.template.revenue + job.getProgress() * job.template.revenue
+        return (round(priorityKey, 2), job.identifier, str(service.template.identifier), service.node)
+    
     def getPrioritizedServices(self, jobInstances):
-        pending = []
-        prioritized = []
-        for job in jobInstances:
-            for service in job.getPendingServices():
-                priorityKey = job.template.revenue + job.getProgress() * job.template.revenue
-                pending.append((priorityKey, service))
-        for service in sorted(pending, key = lambda tuple: '%012.2f %04d %s' % (tuple[0], tuple[1].job.identifier, tuple[1]), reverse = True):
-            prioritized.append(service[1])
-        return prioritized
+        return self.queue.update(jobInstances)
     
 
 class PenaltyBasedPolicy:
@@ -106,20 +220,24 @@ class PenaltyBasedPolicy:
     def __init__(self, parameters):
         self.name = 'Penalty-Based Policy'
         self.parameters = parameters
+        self.reset()
     
     def __str__(self):
         return str(self.name.replace(' ', '_'))
     
+    def reset(self):
+        self.queue = ServiceQueue(self._getPriorityKey, self._getStamp, reverse = True)
+    
+    def _getStamp(self, job):
+        return job.revision
+    
+    def _getPriorityKey(self, service):
+        job = service.job
+        priorityKey = job.template.revenue + job.template.penalty + job.getProgress() * job.template.revenue + job.getProgress() * job.template.penalty
+        return (round(priorityKey, 2), job.identifier, str(service.template.identifier), service.node)
+    
     def getPrioritizedServices(self, jobInstances):
-        pending = []
-        prioritized = []
-        for job in jobInstances:
-            for service in job.getPendingServices():
-                priorityKey = job.template.revenue + job.template.penalty + job.getProgress() * job.template.revenue + job.getProgress() * job.template.penalty
-                pending.append((priorityKey, service))
-        for service in sorted(pending, key = lambda tuple: '%012.2f %04d %s' % (tuple[0], tuple[1].job.identifier, tuple[1]), reverse = True):
-            prioritized.append(service[1])
-        return prioritized
+        return self.queue.update(jobInstances)
 
 
 class ClassifiedPenaltyBasedPolicy:
@@ -132,24 +250,28 @@ class ClassifiedPenaltyBasedPolicy:
     def __init__(self, parameters):
         self.name = 'Classified Penalty-Based Policy'
         self.parameters = parameters
+        self.reset()
     
     def __str__(self):
         return str(self.name.replace(' ', '_'))
     
+    def reset(self):
+        self.queue = ServiceQueue(self._getPriorityKey, self._getStamp, reverse = True)
+    
+    def _getStamp(self, job):
+        return job.revision
+    
+    def _getPriorityKey(self, service):
+        job = service.job
+        customerGoldStatus = 0
+        if job.customer.isGold == True:
+            customerGoldStatus = 1
+        priorityKey = job.template.revenue + job.template.penalty + job.getProgress() * job.template.revenue + job.getProgress() * job.template.penalty
+        priorityKey *= float(self.parameters['GoldWeight']) ** customerGoldStatus
+        return (round(priorityKey, 2), job.identifier, str(service.template.identifier), service.node)
+    
     def getPrioritizedServices(self, jobInstances):
-        pending = []
-        prioritized = []
-        for job in jobInstances:
-            for service in job.getPendingServices():
-                customerGoldStatus = 0
-                if job.customer.isGold == True:
-                    customerGoldStatus = 1
-                priorityKey = job.template.revenue + job.template.penalty + job.getProgress() * job.template.revenue + job.getProgress() * job.template.penalty
-                priorityKey *= float(self.parameters['GoldWeight']) ** customerGoldStatus
-                pending.append((priorityKey, service))
-        for service in sorted(pending, key = lambda tuple: '%012.2f %04d %s' % (tuple[0], tuple[1].job.identifier, tuple[1]), reverse = True):
-            prioritized.append(service[1])
-        return prioritized
+        return self.queue.update(jobInstances)
 
 
 class FailedAttemptsBasedPolicy:
@@ -163,19 +285,33 @@ class FailedAttemptsBasedPolicy:
     def __init__(self, parameters):
         self.name = 'Failed-Attempts-Based Policy'
         self.parameters = parameters
+        self.reset()
     
     def __str__(self):
         return str(self.name.replace(' ', '_'))
     
+    def reset(self):
+        self.queue = ServiceQueue(self._getPriorityKey, self._getStamp, reverse = True)
+    
+    def _getStamp(self, job):
+        # Attempts only increase, so their sum changes with every failed attempt
+        attempts = 0
+        for service in job.getPendingServices():
+            attempts += service.attempts
+        return (job.revision, attempts)
+    
+    def _getPriorityKey(self, service):
+        priorityKey = 1.0 # Possibly set penalty-based key here as a basis for weight by failed attempts
+        if service.template.maxAttempts - service.attempts > 0:
+            priorityKey *= 1.0 / float(service.template.maxAttempts - service.attempts)
+        return (round(priorityKey, 2), service.job.identifier, str(service.template.identifier), service.node)
+    
     def getPrioritizedServices(self, jobInstances):
-        pending = []
-        prioritized = []
-        for job in jobInstances:
-            for service in job.getPendingServices():
-                priorityKey = 1.0 # Possibly set penalty-based key here as a basis for weight by failed attempts
-                if service.template.maxAttempts - service.attempts > 0:
-                    priorityKey *= 1.0 / float(service.template.maxAttempts - service.attempts)
-                pending.append((priorityKey, service))
-        for service in sorted(pending, key = lambda tuple: '%012.2f %04d %s' % (tuple[0], tuple[1].job.identifier, tuple[1]), reverse = True):
-            prioritized.append(service[1])
-        return prioritized
+        return self.queue.update(jobInstances)
+
+
+class AmbiguousPriorityKeyException(Exception):
+    '''Raised when a policy gives two queued services the same
+    priority key (see ServiceQueue).
+    '''
+    pass
@@ -0,0 +1,246 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import collections
+import csv
+import zlib
+
+import numpy
+
+import snsim.generator
+import snsim.job
+import snsim.tracefile
+
+class TraceArrivals:
+    '''Defines an arrival process that replays the number of new jobs
+    per iteration from a column of a binary trace file (see
+    snsim.tracefile), by default the generated jobs of a recorded run.
+    The column is memory-mapped and read window by window. Iterations
+    beyond the end of the trace have no arrivals.
+    '''
+    
+    def __init__(self, filename, column = 'generatedJobs'):
+        self.filename = filename
+        self.column = column
+        self.trace = None
+    
+    def __getstate__(self):
+        # The trace is mapped again after loading a checkpoint
+        state = dict(self.__dict__)
+        state['trace'] = None
+        return state
+    
+    def reset(self):
+        pass
+    
+    def getAmounts(self, start, count, rng):
+        if self.trace is None:
+            self.trace = snsim.tracefile.BinaryTrace(self.filename)
+        amounts = numpy.zeros(count, dtype = numpy.int64)
+        first = max(start, self.trace.offset)
+        stop = min(start + count, self.trace.offset + len(self.trace))
+        if first < stop:
+            column = self.trace.getColumn(self.column)
+            amounts[first - start:stop - start] = column[first - self.trace.offset:stop - self.trace.offset]
+        return amounts
+    
+    def __str__(self):
+        return 'Trace(%s)' % (self.filename)
+
+
+class CSVReplayGenerator(snsim.generator.JobGenerator):
+    '''Defines a job generator that replays a timestamped job log in
+    CSV format. The first line names the columns, which must include
+    the time column (in seconds) and may include a template and a
+    customer column.
+    Records are read one at a time while the simulation runs, so
+    memory does not depend on the size of the log. Only the records
+    of iterations asked for in advance (e.g. by the event engine or
+    an export) are held back until their jobs are generated, and the
+    number of records per iteration is only kept as long as the load
+    trace holds that iteration.
+    
+    A record arrives in iteration (timestamp - startTime) / tickLength,
+    where the start time is the first timestamp unless given. Logs are
+    expected to be sorted by time; a record that is older than the one
+    read before it arrives together with that one.
+    
+    Template and customer values are looked up in the optional
+    mappings (a dict or a function) first and used as identifiers if
+    they are known. Any other value is assigned to a template or
+    customer by a hash of the value, so equal values always map to the
+    same one. Without a template or customer column, they are drawn
+    from their shares like in the job generator.
+    '''
+    
+    def __init__(self, jobTemplates, customers, randomizer = None, filename = None, tickLength = 1.0,
+                 startTime = None, timeColumn = 'timestamp', templateColumn = 'template',
+                 customerColumn = 'customer', templateMapping = None, customerMapping = None, delimiter = ','):
+        if filename is None:
+            raise ValueError('A job log to replay is required.')
+        self.filename = filename
+        self.tickLength = float(tickLength)
+        self.startTime = startTime
+        self.timeColumn = timeColumn
+        self.templateColumn = templateColumn
+        self.customerColumn = customerColumn
+        self.templateMapping = templateMapping
+        self.customerMapping = customerMapping
+        self.delimiter = delimiter
+        self.infile = None
+        snsim.generator.JobGenerator.__init__(self, jobTemplates, customers, randomizer)
+    
+    def __getstate__(self):
+        # The log is reopened at the same position after loading a checkpoint
+        state = dict(self.__dict__)
+        if self.infile is not None:
+            state['position'] = self.infile.tell()
+        state['infile'] = None
+        return state
+    
+    def _open(self):
+        self.infile = open(self.filename, 'rb')
+        if self.position > 0:
+            self.infile.seek(self.position)
+            return
+        header = self._readLine()
+        if header is None:
+            header = []
+        self.columnIndex = dict()
+        for index, name in enumerate(header):
+            self.columnIndex[name.strip()] = index
+        if self.timeColumn not in self.columnIndex:
+            raise ValueError('Job log \'%s\' has no column \'%s\'.' % (self.filename, self.timeColumn))
+    
+    def _readLine(self):
+        # Returns the fields of the next non-empty line or None at the end
+        while True:
+            line = self.infile.readline()
+            if not line:
+                return None
+            line = line.decode('utf-8').strip()
+            if line:
+                return next(csv.reader([line], delimiter = self.delimiter))
+    
+    def _getKey(self, value, mapping, keys, objects):
+        if mapping is not None:
+            value = mapping(value) if callable(mapping) else mapping.get(value, value)
+        if value in objects:
+            return value
+        return keys[zlib.crc32(str(value).encode('utf-8')) % len(keys)]
+    
+    def _getField(self, fields, column):
+        if column is None or column not in self.columnIndex:
+            return None
+        return fields[self.columnIndex[column]].strip()
+    
+    def _readRecord(self):
+        # Reads the next record into the pending ones and counts it,
+        # returns False at the end of the log
+        if self.exhausted:
+            return False
+        if self.infile is None:
+            self._open()
+        fields = self._readLine()
+        if fields is None:
+            self.exhausted = True
+            self.infile.close()
+            self.infile = None
+            return False
+        
+        timestamp = float(self._getField(fields, self.timeColumn))
+        if self.timeOrigin is None:
+            self.timeOrigin = timestamp
+        iteration = max(int((timestamp - self.timeOrigin) // self.tickLength), self.lastIteration, 0)
+        self.lastIteration = iteration
+        
+        template = self._getField(fields, self.templateColumn)
+        if template is not None:
+            template = self._getKey(template, self.templateMapping, self.templateKeys, self.jobTemplates)
+        customer = self._getField(fields, self.customerColumn)
+        if customer is not None:
+            customer = self._getKey(customer, self.customerMapping, self.customerKeys, self.customers)
+        self.pending.append((iteration, template, customer))
+        
+        if iteration not in self.counts:
+            self.countedIterations.append(iteration)
+        self.counts[iteration] += 1
+        return True
+    
+    def _drawIndex(self, shares):
+        return int(numpy.searchsorted(shares, self._getGenerators()[1].random(), side = 'right'))
+    
+    def _getAmountByIteration(self, iteration):
+        # All records of an iteration are read once a later one is
+        while self.lastIteration <= iteration and self._readRecord():
+            pass
+        return self.counts[iteration]
+    
+    def discardAmounts(self, iteration):
+        # Iterations are counted in ascending order, so the discarded
+        # ones are always the first
+        while len(self.countedIterations) and self.countedIterations[0] < iteration:
+            del self.counts[self.countedIterations.popleft()]
+    
+    def reset(self):
+        if getattr(self, 'infile', None) is not None:
+            self.infile.close()
+        snsim.generator.JobGenerator.reset(self)
+        self.infile = None
+        self.position = 0
+        self.exhausted = False
+        self.timeOrigin = self.startTime
+        self.lastIteration = 0
+        self.pending = collections.deque()
+        # Number of records per iteration, only of the iterations that
+        # may still be asked for (see discardAmounts)
+        self.counts = collections.Counter()
+        self.countedIterations = collections.deque()
+    
+    def getNextArrivalIteration(self, iteration, maxIterations):
+        if len(self.pending) == 0:
+            self._readRecord()
+        if len(self.pending) == 0:
+            return maxIterations
+        return min(max(self.pending[0][0], iteration), maxIterations)
+    
+    def setArrivalProcess(self, arrivals):
+        # The replay has no arrival process to replace
+        raise TypeError('Arrivals of \'%s\' are given by the job log.' % (self.filename))
+    
+    def getNewJobInstances(self, iteration):
+        instances = set()
+        if len(self.pending) == 0:
+            self._readRecord()
+        while len(self.pending) and self.pending[0][0] <= iteration:
+            template, customer = self.pending.popleft()[1:]
+            if template is None:
+                template = self.templateKeys[self._drawIndex(self.templateShares)]
+            if customer is None:
+                customer = self.customerKeys[self._drawIndex(self.customerShares)]
+            instances.add(snsim.job.JobInstance(self.nextJobId, self.jobTemplates[template], self.customers[customer]))
+            self.nextJobId += 1
+            if len(self.pending) == 0:
+                self._readRecord()
+        return instances
+    
+    def __str__(self):
+        return 'Replay(%s)' % (self.filename)
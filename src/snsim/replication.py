@@ -0,0 +1,188 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import multiprocessing
+
+import numpy
+
+import snsim.comparison
+import snsim.engine
+import snsim.xmlloader
+
+def getMetricNames(scenario):
+    metrics = ['activeJobs', 'activeServices', 'abortedJobs', 'declinedJobs', 'biddings', 'penalty', 'revenue']
+    for resPool in sorted(scenario.resourcePools.keys()):
+        for resource in sorted(scenario.resourcePools[resPool].resources.keys()):
+            metrics.append('%s.%s' % (resPool, resource))
+    return metrics
+
+def getMetricValues(loadData, metrics):
+    values = numpy.zeros((len(loadData), len(metrics)))
+    for column, metric in enumerate(metrics):
+        if metric == 'revenue':
+            values[:, column] = loadData.getColumn('biddings') - loadData.getColumn('penalty')
+        elif metric in loadData.columns:
+            values[:, column] = loadData.getColumn(metric)
+        else:
+            resPool, resource = metric.split('.', 1)
+            values[:, column] = loadData.getResourceLoad(resPool, resource)
+    return values
+
+def _runReplicas(chunk):
+    # Runs a chunk of replicas in a worker process and only hands back
+    # the running moments, never the load data of a single replica.
+    filename, policy, bouncerActive, maxIterations, engine, seeds, cacheDirectory = chunk
+    scenario = snsim.comparison.setUpScenario(filename, policy, bouncerActive, engine, cacheDirectory)
+    
+    statistics = None
+    for seed in seeds:
+        scenario.parameters['Seed'] = seed
+        scenario.start(maxIterations = maxIterations)
+        if statistics is None:
+            statistics = ReplicationStatistics(getMetricNames(scenario), len(scenario.loadData))
+        statistics.add(getMetricValues(scenario.loadData, statistics.metrics))
+    scenario.reset()
+    return statistics
+
+
+class ReplicationStatistics:
+    '''Defines per-iteration running moments (mean and variance) of
+    the load metrics of several independent replicas of a simulation.
+    Replicas are added one at a time (Welford's method) and partial
+    statistics from several workers can be merged (Chan's method), so
+    the load data of the single replicas never has to be kept.
+    '''
+    
+    def __init__(self, metrics, numIterations):
+        self.metrics = metrics
+        self.count = 0
+        self.mean = numpy.zeros((numIterations, len(metrics)))
+        self.m2 = numpy.zeros((numIterations, len(metrics)))
+    
+    def __str__(self):
+        return 'ReplicationStatistics (%d replicas, %d iterations)' % (self.count, len(self.mean))
+    
+    def add(self, values):
+        if values.shape != self.mean.shape:
+            raise ReplicationMismatchException(str(values.shape))
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+    
+    def merge(self, other):
+        if other.metrics != self.metrics or other.mean.shape != self.mean.shape:
+            raise ReplicationMismatchException(str(other))
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * (float(other.count) / count)
+        self.m2 += other.m2 + delta * delta * (float(self.count) * other.count / count)
+        self.count = count
+    
+    def getMean(self, metric):
+        return self.mean[:, self.metrics.index(metric)]
+    
+    def getVariance(self, metric):
+        if self.count < 2:
+            return numpy.zeros(len(self.mean))
+        return self.m2[:, self.metrics.index(metric)] / (self.count - 1)
+    
+    def getConfidenceBand(self, metric, zValue = 1.96):
+        # Normal approximation, zValue = 1.96 yields a 95% band.
+        mean = self.getMean(metric)
+        halfWidth = zValue * numpy.sqrt(self.getVariance(metric) / max(self.count, 1))
+        return mean - halfWidth, mean + halfWidth
+    
+    def exportTrace(self, filename, zValue = 1.96):
+        with open(filename, 'w') as outfile:
+            outfile.write('#replicas %d, per metric: mean variance lower upper\n' % (self.count))
+            outfile.write('#it %s\n' % (' '.join(self.metrics)))
+            bands = [self.getConfidenceBand(metric, zValue) for metric in self.metrics]
+            variances = [self.getVariance(metric) for metric in self.metrics]
+            for i in range(len(self.mean)):
+                columns = ['%d' % (i)]
+                for column in range(len(self.metrics)):
+                    columns.append('%.4f %.4f %.4f %.4f' % (self.mean[i, column], variances[column][i], bands[column][0][i], bands[column][1][i]))
+                outfile.write('%s\n' % (' '.join(columns)))
+            print('File \'%s\' written.' % (filename))
+
+
+class ReplicationMismatchException(Exception):
+    '''Raised when statistics of replicas with different metrics or
+    a different number of iterations are to be combined.
+    '''
+    pass
+
+
+class Replication:
+    '''Defines a Monte Carlo replication of a scenario/policy pair.
+    Runs a number of independently seeded replicas of the scenario
+    across a process pool and aggregates the per-iteration mean,
+    variance and confidence bands of the load metrics on the fly.
+    Replica seeds are derived from the scenario's Seed parameter
+    and the replica index. cacheDirectory is handed to the scenario
+    loader, as in snsim.comparison.PolicyComparison.
+    '''
+    
+    def __init__(self, filename, policy, replicas, bouncerActive = None, maxIterations = None, engine = None, processes = None, chunkSize = 10, cacheDirectory = None):
+        self.filename = filename
+        self.policy = policy
+        self.replicas = replicas
+        self.bouncerActive = bouncerActive
+        self.maxIterations = maxIterations
+        self.engine = engine if engine is not None else snsim.engine.TickEngine
+        self.processes = processes
+        self.chunkSize = chunkSize
+        self.cacheDirectory = cacheDirectory
+        self.statistics = None
+    
+    def __str__(self):
+        return 'Replication (%s, %s, %d replicas)' % (self.filename, self.policy.__name__, self.replicas)
+    
+    def getSeeds(self, baseSeed):
+        return ['%s:%d' % (baseSeed, replica) for replica in range(self.replicas)]
+    
+    def run(self, baseSeed = None):
+        if baseSeed is None:
+            parameters = snsim.xmlloader.XMLScenarioLoader(self.filename, self.cacheDirectory).parameters
+            baseSeed = parameters['Seed'] if 'Seed' in parameters else ''
+        seeds = self.getSeeds(baseSeed)
+        
+        chunks = []
+        for offset in range(0, len(seeds), self.chunkSize):
+            chunks.append((self.filename, self.policy, self.bouncerActive, self.maxIterations, self.engine, seeds[offset:offset + self.chunkSize], self.cacheDirectory))
+        
+        self.statistics = None
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for statistics in pool.imap_unordered(_runReplicas, chunks):
+                if statistics is None:
+                    continue
+                if self.statistics is None:
+                    self.statistics = statistics
+                else:
+                    self.statistics.merge(statistics)
+        finally:
+            pool.close()
+            pool.join()
+        return self.statistics
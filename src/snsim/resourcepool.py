@@ -19,6 +19,9 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
 # IN THE SOFTWARE.
 
+import heapq
+import numpy
+
 class ResourcePool:
     '''Defines a resource pool for a certain scenario.
     Services reference a certain resource pool each
@@ -26,11 +29,22 @@ class ResourcePool:
     deallocate them when finished. A resource pool keeps
     track of available resources, current allocations and
     their respective requesters.
+    Capacities and levels are kept as fixed-index vectors (one
+    index per resource, see resourceIndex), so a service template
+    can allocate all of its resources with one demand vector.
     '''
     
     def __init__(self, identifier, resources):
         self.identifier = identifier
         self.resources = resources
+        
+        self.resourceNames = list(resources.keys())
+        self.resourceIndex = dict()
+        self.capacities = []
+        for index, resource in enumerate(self.resourceNames):
+            self.resourceIndex[resource] = index
+            self.capacities.append(resources[resource])
+        
         self.reset()
     
     def __str__(self):
@@ -44,35 +58,136 @@ class ResourcePool:
     def setCapacity(self, identifier, capacity):
         if identifier in self.resources and capacity >= 0:
             self.resources[identifier] = capacity
+            self.capacities[self.resourceIndex[identifier]] = capacity
             return True
         return False
     
     def getLevel(self, identifier):
-        if identifier in self.levels:
-            return self.levels[identifier]
+        if identifier in self.resourceIndex:
+            return self.levels[self.resourceIndex[identifier]]
         return None
     
+    def getDemand(self, resources):
+        # Returns the demand vector of the given resource amounts as
+        # (index, amount) pairs. Resources unknown to the pool are ignored.
+        demand = []
+        for resource, amount in resources.items():
+            if resource in self.resourceIndex:
+                demand.append((self.resourceIndex[resource], amount))
+        return demand
+    
+    def getDenseDemand(self, resources):
+        dense = numpy.zeros(len(self.resourceNames))
+        for index, amount in self.getDemand(resources):
+            dense[index] = amount
+        return dense
+    
+    def canAllocate(self, demand):
+        levels = self.levels
+        capacities = self.capacities
+        for index, amount in demand:
+            if levels[index] + amount > capacities[index]:
+                return False
+        return True
+    
+    def allocateDemand(self, requester, demand):
+        # Allocates all resources of the demand vector or none at all
+        if not self.canAllocate(demand):
+            return False
+        levels = self.levels
+        for index, amount in demand:
+            levels[index] += amount
+        return True
+    
+    def deallocateDemand(self, requester, demand):
+        levels = self.levels
+        for index, amount in demand:
+            if levels[index] - amount < 0:
+                # Underrun, do not touch this resource
+                continue
+            levels[index] -= amount
+    
+    def getFeasible(self, denseDemands):
+        # Returns for each row of a (N x resources) demand matrix
+        # whether it would fit into the pool right now.
+        return numpy.all(numpy.asarray(self.levels) + denseDemands <= numpy.asarray(self.capacities), axis = 1)
+    
     def allocate(self, requester, identifier, amount):
-        if identifier not in self.resources or identifier not in self.levels:
+        if identifier not in self.resourceIndex:
             return None
-        if self.levels[identifier] + amount > self.resources[identifier]:
+        index = self.resourceIndex[identifier]
+        if self.levels[index] + amount > self.capacities[index]:
             raise ResourceCapacityExceededException(identifier)
-        self.levels[identifier] += amount
+        self.levels[index] += amount
         return True
     
     def deallocate(self, requester, identifier, amount):
-        if identifier not in self.resources or identifier not in self.levels:
+        if identifier not in self.resourceIndex:
             return None
-        if self.levels[identifier] - amount < 0:
+        index = self.resourceIndex[identifier]
+        if self.levels[index] - amount < 0:
             raise ResourceCapacityUnderrunException(identifier)
-            self.levels[identifier] = 0
         else:
-            self.levels[identifier] -= amount
+            self.levels[index] -= amount
     
     def reset(self):
-        self.levels = dict()
-        for res in self.resources:
-            self.levels[res] = 0
+        self.levels = [0] * len(self.resourceNames)
+
+
+class DemandIndex:
+    '''Defines an index of the smallest outstanding demand per resource
+    of the pending services of one resource pool. If even the smallest
+    outstanding demand of some resource exceeds its free capacity, none
+    of the outstanding services can be started and the pool counts as
+    saturated. Templates that do not demand a resource never make the
+    pool saturated by that resource, a pool without outstanding demand
+    is always saturated.
+    
+    The minimum per resource is kept in a heap with lazy deletion, so
+    removing a template costs O(log n) amortized instead of a rescan
+    of all outstanding templates.
+    '''
+    
+    def __init__(self, pool):
+        self.pool = pool
+        self.counts = dict()
+        self.heaps = [[] for _ in pool.resourceNames]
+        self.saturated = None
+    
+    def add(self, template, count = 1):
+        if template not in self.counts:
+            self.counts[template] = 0
+            demand = dict(template.demand)
+            for index, heap in enumerate(self.heaps):
+                amount = demand[index] if index in demand else float('-inf')
+                heapq.heappush(heap, (amount, id(template), template))
+            self.saturated = None
+        self.counts[template] += count
+    
+    def remove(self, template):
+        self.counts[template] -= 1
+        if self.counts[template] == 0:
+            del self.counts[template]
+            self.saturated = None
+    
+    def invalidate(self):
+        # Has to be called whenever the levels of the pool change
+        self.saturated = None
+    
+    def _getMinimum(self, index):
+        heap = self.heaps[index]
+        while heap and heap[0][2] not in self.counts:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else float('inf')
+    
+    def isSaturated(self):
+        if self.saturated is None:
+            self.saturated = False
+            for index, (level, capacity) in enumerate(zip(self.pool.levels, self.pool.capacities)):
+                if level + self._getMinimum(index) > capacity:
+                    self.saturated = True
+                    break
+        return self.saturated
 
 
 class ResourceCapacityExceededException(Exception):
@@ -85,4 +200,4 @@ class ResourceCapacityUnderrunException(Exception):
     '''Raised when a service template tries to free more resources
     than available or than it has allocated.
     '''
-    pass
\ No newline at end of file
+    pass
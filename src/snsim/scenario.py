@@ -19,6 +19,8 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
 # IN THE SOFTWARE.
 
+import collections
+import operator
 import random
 import time
 
@@ -26,9 +28,15 @@ import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.patches as plp
 
+import snsim.checkpoint
+import snsim.engine
 import snsim.job
+import snsim.observer
 import snsim.resourcepool
 import snsim.service
+import snsim.timing
+import snsim.trace
+import snsim.tracefile
 
 class Scenario:
     '''Defines a whole scenario for the service network simulation.
@@ -36,7 +44,11 @@ class Scenario:
     and customers, a scenario is able to generate a set of job
     instances or apply a job generator to continuously generate jobs. 
     If a policy is set, the scenario is used to run and control the 
-    complete simulation.
+    complete simulation. The iteration loop itself is driven by an
+    engine (see snsim.engine), which defaults to the fixed-tick engine.
+    Whatever is recorded during a run is up to observers (see
+    snsim.observer); by default, the load trace, the scheduling data
+    and the abort markers are collected.
     Scenarios can be reset in order to re-run a simulation based
     on the same set of job instances with another policy set.
     '''
@@ -51,6 +63,18 @@ class Scenario:
         self.policy = None
         self.generator = None
         self.bouncer = None
+        self.engine = snsim.engine.TickEngine(self)
+        self.chargeInfeasibleAttempts = True
+        self.traceStream = None
+        self.checkpoint = None
+        self.timer = snsim.timing.PhaseTimer()
+        
+        self.observers = []
+        self.hooks = snsim.observer.getHooks(self.observers)
+        self.loadCollector = None
+        self.scheduleCollector = None
+        self.abortCollector = None
+        self.setCollectors()
         
         self.reset()
     
@@ -64,27 +88,129 @@ class Scenario:
     def setPolicy(self, policy):
         self.policy = policy(self.parameters)
     
-    def setGenerator(self, generator):
-        self.generator = generator(self.jobTemplates, self.customers, randomizer = self.random)
+    def setGenerator(self, generator, **options):
+        # Further options are handed to the generator, e.g. the arrival
+        # process or the job log to replay
+        self.generator = generator(self.jobTemplates, self.customers, randomizer = self.random, **options)
         
     def setBouncer(self, bouncer):
         self.bouncer = bouncer()
     
+    def setEngine(self, engine):
+        self.engine = engine(self)
+    
+    def setChargeInfeasibleAttempts(self, charge):
+        # If disabled, services of saturated resource pools are skipped
+        # without using up one of their attempts.
+        self.chargeInfeasibleAttempts = charge
+    
+    def setServicePool(self, servicePool):
+        # Lets finished service instances be recycled, None disables it
+        for id in self.jobTemplates:
+            self.jobTemplates[id].servicePool = servicePool
+    
+    def setTraceStream(self, filename, chunkSize = 1024):
+        # Writes the load trace to filename while the simulation runs,
+        # keeping only a bounded part of it in memory. None disables it.
+        if filename is None:
+            self.traceStream = None
+        else:
+            self.traceStream = (filename, chunkSize)
+    
+    def addObserver(self, observer):
+        # Observers are notified of events in the order they were added
+        # (see snsim.observer.Observer)
+        self.observers.append(observer)
+        self._updateHooks()
+    
+    def removeObserver(self, observer):
+        self.observers.remove(observer)
+        self._updateHooks()
+    
+    def _updateHooks(self):
+        self.hooks = snsim.observer.getHooks(self.observers)
+        # Finished services are reported by their jobs (see JobInstance._retire)
+        finishHook = None
+        if len(self.hooks['onServiceFinished']):
+            finishHook = self._notifyServicesFinished
+        for id in self.jobTemplates:
+            self.jobTemplates[id].finishHook = finishHook
+    
+    def _setCollector(self, collector, cls, enabled):
+        if enabled and collector is None:
+            collector = cls()
+            self.addObserver(collector)
+        elif not enabled and collector is not None:
+            self.removeObserver(collector)
+            collector = None
+        return collector
+    
+    def setCollectors(self, load = True, schedule = True, aborts = True):
+        # Enables or disables the built-in collectors of loadData,
+        # scheduleData and plotAborts, which are None if disabled.
+        # Runs that only need the final revenue can do without them.
+        self.loadCollector = self._setCollector(self.loadCollector, snsim.observer.LoadCollector, load)
+        self.scheduleCollector = self._setCollector(self.scheduleCollector, snsim.observer.ScheduleCollector, schedule)
+        self.abortCollector = self._setCollector(self.abortCollector, snsim.observer.AbortCollector, aborts)
+    
+    def setProfilePhase(self, phase):
+        # Runs the given phase (see snsim.timing.PHASES) under cProfile,
+        # None disables it
+        self.timer.setProfilePhase(phase)
+    
+    def setCheckpoint(self, filename, iteration, interval = None):
+        # Saves the simulation state to filename once the given iteration
+        # is reached and, with an interval, again every interval iterations.
+        # None as filename disables checkpoints.
+        if filename is None:
+            self.checkpoint = None
+        else:
+            self.checkpoint = (filename, iteration, interval)
+    
+    def saveCheckpoint(self, iteration):
+        # Called by the engine at the top of an iteration
+        filename, checkpointIteration, interval = self.checkpoint
+        if interval:
+            while checkpointIteration <= iteration:
+                checkpointIteration += interval
+            self.checkpoint = (filename, checkpointIteration, interval)
+        else:
+            self.checkpoint = None
+        if self.loadData is not None:
+            self.loadData.flush()
+        snsim.checkpoint.saveCheckpoint(self, filename)
+        print('Checkpoint \'%s\' written at iteration %d.' % (filename, iteration))
+    
     def generateInitialJobs(self, count):
         self.jobInstances = set()
         for id in range(0, count):
             randomJobTemplate = self.jobTemplates[self.random.choice([k for k in self.jobTemplates.keys()])]
             randomCustomer = self.customers[self.random.choice([k for k in self.customers.keys()])]
             self.jobInstances.add(snsim.job.JobInstance(id, randomJobTemplate, randomCustomer))
+        for hook in self.hooks['onJobAccepted']:
+            for job in self.jobInstances:
+                hook(0, job)
     
     def reset(self):
         self.numIterations = 0
         self.sumBiddings = 0.0
         self.sumPenalty = 0.0
-        self.loadData = list()
-        self.scheduleData = dict()
-        self.plotAborts = dict()
+        self.abortedJobs = 0
+        self.declinedJobs = 0
+        self.currentIteration = 0
         self.jobInstances = set()
+        self.timer.reset()
+        
+        if self.bouncer and self.loadCollector is None:
+            print('! The bouncer needs the load trace, collecting it anyway.')
+            self.loadCollector = self._setCollector(None, snsim.observer.LoadCollector, True)
+        # Job templates may be shared with other scenarios of the same loader
+        self._updateHooks()
+        for observer in self.observers:
+            observer.reset(self)
+        self.loadData = self.loadCollector.trace if self.loadCollector is not None else None
+        self.scheduleData = self.scheduleCollector.scheduleData if self.scheduleCollector is not None else None
+        self.plotAborts = self.abortCollector.aborts if self.abortCollector is not None else None
         
         if 'Seed' in self.parameters:
             self.random = random.Random(self.parameters['Seed'])
@@ -98,9 +224,145 @@ class Scenario:
         if self.bouncer:
             self.bouncer.reset()
         
+        if self.policy:
+            self.policy.reset()
+        
+        self.engine.reset()
+        
         for id in self.resourcePools:
             self.resourcePools[id].reset()
     
+    def _createLoadTrace(self):
+        if self.traceStream is None:
+            return snsim.trace.LoadTrace(self.resourcePools)
+        
+        filename, chunkSize = self.traceStream
+        sink = snsim.trace.TraceWriter(filename, self.generator, chunkSize)
+        retain = 64
+        if self.bouncer:
+            retain = max(retain, self.bouncer.horizon + 1)
+        return snsim.trace.LoadTrace(self.resourcePools, sink = sink, retain = retain)
+    
+    def admitJobs(self, iteration):
+        self.currentIteration = iteration
+        newJobs = set()
+        if self.generator is not None:
+            self.timer.enter(snsim.timing.GENERATION)
+            # Exports only ask for the iterations the load trace holds
+            self.generator.discardAmounts(self.loadData.offset if self.loadData is not None else iteration)
+            newJobs = self.generator.getNewJobInstances(iteration)
+            if self.bouncer:
+                self.timer.enter(snsim.timing.BOUNCER)
+                newJobs, decline = self.bouncer.filterJobs(newJobs, self.loadData)
+                self.declinedJobs += len(decline)
+                for hook in self.hooks['onJobDeclined']:
+                    for job in decline:
+                        hook(iteration, job)
+            self.jobInstances.update(newJobs)
+            for hook in self.hooks['onJobAccepted']:
+                for job in newJobs:
+                    hook(iteration, job)
+        return newJobs
+    
+    def _getDemandIndices(self, prioritizedServiceList):
+        demandIndices = dict()
+        counts = collections.Counter(map(operator.attrgetter('template'), prioritizedServiceList))
+        for template in counts:
+            if template.resourcePool not in demandIndices:
+                demandIndices[template.resourcePool] = snsim.resourcepool.DemandIndex(template.resourcePool)
+            demandIndices[template.resourcePool].add(template, counts[template])
+        return demandIndices
+    
+    def startServices(self, iteration, prioritizedServiceList):
+        started = []
+        aborted = set()
+        rejected = []
+        startedHooks = self.hooks['onServiceStarted']
+        rejectedHooks = self.hooks['onServiceRejected']
+        # Without charging infeasible attempts, saturated pools let us
+        # skip their services without trying them. Otherwise every
+        # service has to be tried anyway and no index is needed.
+        demandIndices = None
+        if not self.chargeInfeasibleAttempts:
+            demandIndices = self._getDemandIndices(prioritizedServiceList)
+            # Saturation only grows while no job is aborted, since levels
+            # only increase and outstanding demand only shrinks
+            saturatedPools = set()
+        for service in prioritizedServiceList:
+            if demandIndices is not None:
+                demandIndex = demandIndices[service.template.resourcePool]
+                saturated = demandIndex.isSaturated()
+                demandIndex.remove(service.template)
+                if saturated:
+                    if demandIndex not in saturatedPools:
+                        saturatedPools.add(demandIndex)
+                        saturatedPools.update([index for index in demandIndices.values() if index.isSaturated()])
+                        if len(saturatedPools) == len(demandIndices):
+                            # No remaining service can be started at all
+                            break
+                    continue
+            
+            status = service.job.tryStartService(service) # Weird, but service must not start itself!
+            
+            if status == snsim.service.STARTED:
+                for hook in startedHooks:
+                    hook(iteration, service)
+                started.append(service)
+                if demandIndices is not None:
+                    demandIndex.invalidate()
+                continue
+            
+            for hook in rejectedHooks:
+                hook(iteration, service)
+            if status == snsim.service.NO_CAPACITY:
+                rejected.append(service)
+            else:
+                # Maximum number of attempts reached or service not pending
+                # (e.g. because its job has been aborted already)
+                wasAborted = service.job.wasAborted
+                service.job.abort()
+                if not wasAborted:
+                    for hook in self.hooks['onJobAborted']:
+                        hook(iteration, service.job)
+                aborted.add(service.job)
+                if demandIndices is not None:
+                    for index in demandIndices.values():
+                        index.invalidate()
+                    saturatedPools.clear()
+        return started, aborted, rejected
+    
+    def settleJobs(self, jobs):
+        clear = set()
+        for job in jobs:
+            if job.wasAborted:
+                self.abortedJobs += 1
+                self.sumPenalty += job.template.penalty
+            if job.isFinished:
+                clear.add(job)
+            if job.isFinished and not job.wasAborted:
+                self.sumBiddings += job.template.revenue
+                for hook in self.hooks['onJobFinished']:
+                    hook(self.currentIteration, job)
+        self.jobInstances.difference_update(clear)
+        return clear
+    
+    def _notifyServicesFinished(self, job, services):
+        for hook in self.hooks['onServiceFinished']:
+            for service in services:
+                hook(self.currentIteration, service)
+    
+    def endTick(self, iteration, numJobs, numServices):
+        for hook in self.hooks['onTickEnd']:
+            hook(iteration, numJobs, numServices)
+    
+    def repeatTicks(self, iteration, count):
+        # Marks count iterations from the given one in which the
+        # system state did not change.
+        if count <= 0:
+            return
+        for hook in self.hooks['onTicksRepeated']:
+            hook(iteration, count)
+    
     def start(self, maxIterations = None):
         self.reset()
         if self.generator is None:
@@ -110,175 +372,121 @@ class Scenario:
             print('! No policy defined. Not starting simulation.')
             return
         
-        print('Starting simulation (%s)' % (self.policy))
+        print('Starting simulation (%s, %s)' % (self.policy, self.engine))
         if maxIterations is None:
             maxIterations = 200
-        iteration = 0
-        abortedJobs = 0
-        declinedJobs = 0
-        absoluteStartTime = time.clock()
-        
-        while iteration < maxIterations:
+        self._run(maxIterations)
+    
+    def _run(self, maxIterations):
+        if self.loadData is not None:
+            self.loadData.reserve(maxIterations)
+        absoluteStartTime = time.perf_counter()
+        self.numIterations = self.engine.run(maxIterations)
+        for observer in self.observers:
+            observer.close()
+        print('Simulation finished after %d iterations (%.4fs elapsed).' % (self.numIterations, time.perf_counter() - absoluteStartTime))
+        print('Time per phase: %s.' % (self.timer.getBreakdown()))
+        self.timer.printProfile()
+    
+    def resume(self, maxIterations = None):
+        # Continues a simulation loaded by snsim.checkpoint.loadCheckpoint
+        # (or a finished one) up to maxIterations.
+        if maxIterations is None:
+            maxIterations = 200
+        print('Resuming simulation (%s, %s) at iteration %d' % (self.policy, self.engine, self.engine.iteration))
+        self._run(maxIterations)
+    
+    def _getGeneratedJobs(self):
+        generatedJobs = []
+        for i in range(self.loadData.offset, len(self.loadData)):
             if self.generator is not None:
-                newJobs = self.generator.getNewJobInstances(iteration)
-                if self.bouncer:
-                    accept, decline = self.bouncer.filterJobs(newJobs, self.loadData)
-                    declinedJobs += len(decline)
-                    self.jobInstances = self.jobInstances.union(self.jobInstances, accept)
-                else:
-                    self.jobInstances = self.jobInstances.union(self.jobInstances, newJobs)
-            
-            prioritizedServiceList = self.policy.getPrioritizedServices(self.jobInstances)
-            numServices = len(prioritizedServiceList)
-            numJobs = len(self.jobInstances)
-            for service in prioritizedServiceList:
-                jobIndex = '%03d' % (service.job.identifier)
-                serviceIndex = '(%s,%s)' % (service.job.currentTuple, service.template.identifier)
-                if jobIndex not in self.scheduleData:
-                    self.scheduleData[jobIndex] = dict()
-                if serviceIndex not in self.scheduleData[jobIndex]:
-                    self.scheduleData[jobIndex][serviceIndex] = list()
-                
-                try:
-                    service.job.startService(service) # Weird, but service must not start itself!
-                    self.scheduleData[jobIndex][serviceIndex].append((iteration, service.template.ticks))
-                except snsim.resourcepool.ResourceCapacityExceededException:
-                    pass
-                except snsim.service.MaxAttemptsReachedException:
-                    service.job.abort()
-                    self.plotAborts[jobIndex] = iteration
-                except snsim.job.ServiceNotPendingException:
-                    service.job.abort()
-                    self.plotAborts[jobIndex] = iteration
-            
-            clear = set()
-            for job in self.jobInstances:
-                job.step()
-                if job.wasAborted:
-                    abortedJobs += 1
-                    self.sumPenalty += job.template.penalty
-                if job.isFinished:
-                    clear.add(job)
-                if job.isFinished and not job.wasAborted:
-                    self.sumBiddings += job.template.revenue
-            for job in clear:
-                self.jobInstances.remove(job)
-            
-            #print('Step %03d (%.4fs elapsed)' % (iteration, time.clock() - starttime))
-            
-            # Collect system load information
-            self.loadData.append(dict())
-            self.loadData[iteration]['activeJobs'] = numJobs
-            self.loadData[iteration]['activeServices'] = numServices
-            self.loadData[iteration]['abortedJobs'] = abortedJobs
-            self.loadData[iteration]['declinedJobs'] = declinedJobs
-            self.loadData[iteration]['biddings'] = self.sumBiddings
-            self.loadData[iteration]['penalty'] = self.sumPenalty
-            self.loadData[iteration]['resources'] = dict()
-            for resPool in self.resourcePools:
-                self.loadData[iteration]['resources'][resPool] = dict()
-                for resource in self.resourcePools[resPool].resources:
-                    self.loadData[iteration]['resources'][resPool][resource] = \
-                        float(self.resourcePools[resPool].levels[resource]) / float(self.resourcePools[resPool].resources[resource])
-            
-            iteration += 1
-            
-        # End of main while loop
-        self.numIterations = iteration
-        print('Simulation finished after %d iterations (%.4fs elapsed).' % (self.numIterations, time.clock() - absoluteStartTime))
+                generatedJobs.append(self.generator._getAmountByIteration(i))
+            else:
+                generatedJobs.append(0)
+        return generatedJobs
+    
+    def _hasLoadData(self):
+        if self.loadData is None:
+            print('! No load trace collected (see setCollectors).')
+            return False
+        return True
     
     def exportCSV(self):
+        if not self._hasLoadData():
+            return
         filename = '../reports/%s.out' % (self.policy)
         
+        activeJobs = self.loadData.getColumn('activeJobs')
+        activeServices = self.loadData.getColumn('activeServices')
+        abortedJobs = self.loadData.getColumn('abortedJobs')
+        declinedJobs = self.loadData.getColumn('declinedJobs')
+        resourceCPU = self.loadData.getResourceLoad('ResourcePool01', 'CPU')
+        resourceMem = self.loadData.getResourceLoad('ResourcePool01', 'Memory')
+        resourceBwh = self.loadData.getResourceLoad('ResourcePool01', 'Bandwidth')
+        biddings = self.loadData.getColumn('biddings')
+        penalty = self.loadData.getColumn('penalty')
+        generatedJobs = self._getGeneratedJobs()
+        
         with open(filename, 'w') as reportFile:
-            reportFile.write('#iteration newjobs activejobs activeservices aborted cpu memory bandwidth biddings penalty\n')
-            it = 0
-            for iteration in self.loadData:
-                reportFile.write('%d;%d;%d;%d;%d;%1.4f;%1.4f;%1.4f;%.2f;%.2f\n' 
+            reportFile.write('#iteration newjobs activejobs activeservices aborted declined cpu memory bandwidth biddings penalty\n')
+            # Rows of a streamed trace start at its offset
+            for it in range(self.loadData.offset, len(self.loadData)):
+                j = it - self.loadData.offset
+                reportFile.write('%d;%d;%d;%d;%d;%d;%1.4f;%1.4f;%1.4f;%.2f;%.2f\n' 
                       % (it,
-                         self.generator._getAmountByIteration(it),
-                         iteration['activeJobs'],
-                         iteration['activeServices'],
-                         iteration['abortedJobs'],
-                         iteration['declinedJobs'],
-                         iteration['resources']['ResourcePool01']['CPU'], 
-                         iteration['resources']['ResourcePool01']['Memory'], 
-                         iteration['resources']['ResourcePool01']['Bandwidth'],
-                         iteration['biddings'],
-                         iteration['penalty']
+                         generatedJobs[j],
+                         activeJobs[j],
+                         activeServices[j],
+                         abortedJobs[j],
+                         declinedJobs[j],
+                         resourceCPU[j], 
+                         resourceMem[j], 
+                         resourceBwh[j],
+                         biddings[j],
+                         penalty[j]
                          ))
-                it += 1
     
-    def exportTrace(self, filename):
+    def _getTrace(self):
         trace = dict()
-        trace['activeJobs'] = []
-        trace['activeServices'] = []
-        trace['generatedJobs'] = []
-        trace['abortedJobs'] = []
-        trace['declinedJobs'] = []
-        trace['resourceCPU'] = []
-        trace['resourceMem'] = []
-        trace['resourceBwh'] = []
-        trace['accBiddings'] = []
-        trace['accPenalties'] = []
-        trace['accRevenue'] = []
-        trace['resourceAvg'] = []
-        
-        for iteration in self.loadData:
-            trace['activeJobs'].append(iteration['activeJobs'])
-            trace['activeServices'].append(iteration['activeServices'])
-            if self.generator is not None:
-                trace['generatedJobs'].append(self.generator._getAmountByIteration(len(trace['generatedJobs'])))
-            else:
-                trace['generatedJobs'].append(0)
-            trace['abortedJobs'].append(iteration['abortedJobs'])
-            trace['declinedJobs'].append(iteration['declinedJobs'])
-            trace['resourceCPU'].append(iteration['resources']['ResourcePool01']['CPU'])
-            trace['resourceMem'].append(iteration['resources']['ResourcePool01']['Memory'])
-            trace['resourceBwh'].append(iteration['resources']['ResourcePool01']['Bandwidth'])
-            trace['accBiddings'].append(iteration['biddings'])
-            trace['accPenalties'].append(iteration['penalty'])
-            trace['accRevenue'].append(iteration['biddings'] - iteration['penalty'])
-            trace['resourceAvg'].append((iteration['resources']['ResourcePool01']['CPU'] + iteration['resources']['ResourcePool01']['Memory']) / 2.0)
-        
-        with open(filename, 'w') as outfile:
-            outfile.write('#it actjobs actserv genjobs abrtjobs decljobs rescpu resmem bids pentys revenue\n')
-            for i in range(len(trace['activeJobs'])):
-                outfile.write('%d %d %d %d %d %d %.2f %.2f %.2f %.2f %.2f %.2f\n' % \
-                              (i, trace['activeJobs'][i], trace['activeServices'][i], trace['generatedJobs'][i], \
-                               trace['abortedJobs'][i], trace['declinedJobs'][i], trace['resourceCPU'][i], trace['resourceMem'][i], \
-                               trace['accBiddings'][i], trace['accPenalties'][i], trace['accRevenue'][i], trace['resourceAvg'][i]))
-            print('File \'%s\' written.' % (filename))
+        trace['activeJobs'] = self.loadData.getColumn('activeJobs')
+        trace['activeServices'] = self.loadData.getColumn('activeServices')
+        trace['generatedJobs'] = self._getGeneratedJobs()
+        trace['abortedJobs'] = self.loadData.getColumn('abortedJobs')
+        trace['declinedJobs'] = self.loadData.getColumn('declinedJobs')
+        trace['resourceCPU'] = self.loadData.getResourceLoad('ResourcePool01', 'CPU')
+        trace['resourceMem'] = self.loadData.getResourceLoad('ResourcePool01', 'Memory')
+        trace['resourceBwh'] = self.loadData.getResourceLoad('ResourcePool01', 'Bandwidth')
+        trace['accBiddings'] = self.loadData.getColumn('biddings')
+        trace['accPenalties'] = self.loadData.getColumn('penalty')
+        trace['accRevenue'] = trace['accBiddings'] - trace['accPenalties']
+        trace['resourceAvg'] = (trace['resourceCPU'] + trace['resourceMem']) / 2.0
+        return trace
+    
+    def exportTrace(self, filename):
+        if not self._hasLoadData():
+            return
+        if self.loadData.offset > 0:
+            print('! Load trace was streamed to \'%s\', only the last %d iterations are exported.' \
+                  % (self.traceStream[0], len(self.loadData) - self.loadData.offset))
+        
+        writer = snsim.trace.TraceWriter(filename, self.generator)
+        writer.open()
+        writer.write(self.loadData, self.loadData.offset, len(self.loadData))
+        writer.close()
+        print('File \'%s\' written.' % (filename))
+    
+    def exportBinaryTrace(self, filename):
+        # Lossless, memory-mappable counterpart of exportTrace (see snsim.tracefile)
+        if not self._hasLoadData():
+            return
+        metadata = {'policy': str(self.policy), 'engine': str(self.engine), 'iterations': self.numIterations,
+                    'phases': self.timer.getTotals()}
+        snsim.tracefile.writeBinaryTrace(filename, self.loadData, self.generator, metadata)
     
     def plotGraphs(self):
-        trace = dict()
-        trace['activeJobs'] = []
-        trace['activeServices'] = []
-        trace['generatedJobs'] = []
-        trace['abortedJobs'] = []
-        trace['declinedJobs'] = []
-        trace['resourceCPU'] = []
-        trace['resourceMem'] = []
-        trace['resourceBwh'] = []
-        trace['accBiddings'] = []
-        trace['accPenalties'] = []
-        trace['accRevenue'] = []
-        
-        for iteration in self.loadData:
-            trace['activeJobs'].append(iteration['activeJobs'])
-            trace['activeServices'].append(iteration['activeServices'])
-            if self.generator is not None:
-                trace['generatedJobs'].append(self.generator._getAmountByIteration(len(trace['generatedJobs'])))
-            else:
-                trace['generatedJobs'].append(0)
-            trace['abortedJobs'].append(iteration['abortedJobs'])
-            trace['declinedJobs'].append(iteration['declinedJobs'])
-            trace['resourceCPU'].append(iteration['resources']['ResourcePool01']['CPU'])
-            trace['resourceMem'].append(iteration['resources']['ResourcePool01']['Memory'])
-            trace['resourceBwh'].append(iteration['resources']['ResourcePool01']['Bandwidth'])
-            trace['accBiddings'].append(iteration['biddings'])
-            trace['accPenalties'].append(iteration['penalty'])
-            trace['accRevenue'].append(iteration['biddings'] - iteration['penalty'])
+        if not self._hasLoadData():
+            return
+        trace = self._getTrace()
         
         font = {'family': 'serif', 'weight': 'light', 'size': 7}
         legend = {'fontsize': 7}
@@ -366,6 +574,9 @@ class Scenario:
         fig.savefig('../figures/%s_revenue.png' % (self.policy), facecolor = fig.get_facecolor(), edgecolor = 'none')
     
     def plotScheduling(self):
+        if self.scheduleData is None:
+            print('! No scheduling data collected (see setCollectors).')
+            return
         if len(self.scheduleData) > 25 or self.numIterations > 100:
             print('! Scheduling plot will be unreadable with high job count or high iteration count.')
         
@@ -391,7 +602,7 @@ class Scenario:
                 rect = plp.Rectangle((0, vIndex + 0.5), self.numIterations, len(self.scheduleData[job]), facecolor = 'gray', edgecolor = 'none', alpha = 0.2, fill = True)
                 plt.gca().add_patch(rect)
             
-            if job in self.plotAborts:
+            if self.plotAborts is not None and job in self.plotAborts:
                 # Draw red block whenever a job was aborted
                 rect = plp.Rectangle((self.plotAborts[job], vIndex + 0.5), 1, len(self.scheduleData[job]), facecolor = 'red', edgecolor = 'none', alpha = 1.0, fill = True)
                 plt.gca().add_patch(rect)
@@ -21,6 +21,12 @@
 
 import snsim.resourcepool
 
+# Status codes of ServiceInstance.tryStart and JobInstance.tryStartService
+STARTED = 0
+NO_CAPACITY = 1
+MAX_ATTEMPTS_REACHED = 2
+NOT_PENDING = 3
+
 class ServiceTemplate:
     '''Defines basic settings for a certain type of service. Based
     on this description, service instances can be spawned, that keep
@@ -39,27 +45,24 @@ class ServiceTemplate:
         
         self.ticks = ticks
         self.maxAttempts = maxAttempts
+        
+        # Demand as (index, amount) pairs of the resource pool's
+        # fixed resource indices, and as a dense vector for batch queries.
+        self.demand = self.resourcePool.getDemand(self.resources)
+        self.denseDemand = self.resourcePool.getDenseDemand(self.resources)
     
     def __str__(self):
         return str(self.identifier)
     
+    def tryAllocate(self, requester):
+        return self.resourcePool.allocateDemand(requester, self.demand)
+    
     def allocate(self, requester):
-        success = dict()
-        try:
-            for resName, amount in self.resources.items():
-                self.resourcePool.allocate(requester, resName, amount)
-                success[resName] = True
-        except snsim.resourcepool.ResourceCapacityExceededException as rce:
-            for resName in success:
-                self.resourcePool.deallocate(requester, resName, self.resources[resName])
-            raise snsim.resourcepool.ResourceCapacityExceededException(str(rce))
+        if not self.tryAllocate(requester):
+            raise snsim.resourcepool.ResourceCapacityExceededException(str(self.identifier))
     
     def deallocate(self, requester):
-        for resName, amount in self.resources.items():    
-            try:
-                self.resourcePool.deallocate(requester, resName, amount)
-            except snsim.resourcepool.ResourceCapacityUnderrunException:
-                continue
+        self.resourcePool.deallocateDemand(requester, self.demand)
 
 
 class ServiceInstance:
@@ -70,10 +73,17 @@ class ServiceInstance:
     job templates.
     '''
     
-    def __init__(self, template, job):
+    __slots__ = ('template', 'ticksLeft', 'job', 'node', 'attempts', 'isRunning', 'wasAborted', 'isFinished')
+    
+    def __init__(self, template, job, node = 0):
+        self.reset(template, job, node)
+    
+    def reset(self, template, job, node = 0):
         self.template = template
         self.ticksLeft = self.template.ticks
         self.job = job
+        # Index of the service in the job template's signature
+        self.node = node
         
         self.attempts = 0
         self.isRunning = False
@@ -81,20 +91,27 @@ class ServiceInstance:
         self.isFinished = False
     
     def __str__(self):
-        return '%s:%d:%s' % (self.job.identifier, self.job.currentTuple, self.template.identifier)
+        return '%s:%d:%s' % (self.job.identifier, self.job.template.depths[self.node], self.template.identifier)
     
-    def start(self):
+    def tryStart(self):
+        # Same as start, but returns a status code instead of raising
         if self.attempts >= self.template.maxAttempts:
-            raise MaxAttemptsReachedException
+            return MAX_ATTEMPTS_REACHED
         if self.isRunning:
-            return
+            return STARTED
         
-        try:
-            self.template.allocate(self)
-        except snsim.resourcepool.ResourceCapacityExceededException as rce:
+        if not self.template.tryAllocate(self):
             self.attempts += 1
-            raise snsim.resourcepool.ResourceCapacityExceededException(str(rce))
+            return NO_CAPACITY
         self.isRunning = True
+        return STARTED
+    
+    def start(self):
+        status = self.tryStart()
+        if status == MAX_ATTEMPTS_REACHED:
+            raise MaxAttemptsReachedException
+        if status == NO_CAPACITY:
+            raise snsim.resourcepool.ResourceCapacityExceededException(str(self.template.identifier))
     
     def step(self):
         if not self.isRunning:
@@ -103,6 +120,10 @@ class ServiceInstance:
         if self.ticksLeft <= 0:
             self.stop()
     
+    def finish(self):
+        self.ticksLeft = 0
+        self.stop()
+    
     def stop(self):
         if not self.isRunning:
             return
@@ -121,4 +142,33 @@ class MaxAttemptsReachedException(Exception):
     '''Raised when a service is requested to start but has already
     reached its maximum number of start attempts.
     '''
-    pass
\ No newline at end of file
+    pass
+
+
+class ServiceInstancePool:
+    '''Defines a bounded pool of service instances that finished
+    regularly and may be recycled for new pending services instead of
+    allocating fresh objects. Instances of aborted jobs are never
+    recycled, since engines may still hold references to them.
+    '''
+    
+    def __init__(self, maxSize = 4096):
+        self.maxSize = maxSize
+        self.instances = []
+    
+    def __len__(self):
+        return len(self.instances)
+    
+    def acquire(self, template, job, node = 0):
+        if len(self.instances):
+            service = self.instances.pop()
+            service.reset(template, job, node)
+            return service
+        return ServiceInstance(template, job, node)
+    
+    def release(self, services):
+        for service in services:
+            if len(self.instances) >= self.maxSize:
+                break
+            service.job = None
+            self.instances.append(service)
@@ -0,0 +1,223 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import os
+import random
+import tempfile
+import xml.sax.saxutils
+
+# Scratch directory of generated scenarios, so they are kept apart from
+# the bundled ones in ../scenarios
+DIRECTORY = os.path.join(tempfile.gettempdir(), 'snsim')
+
+# Sizes of the scenarios used to measure how the simulator scales
+SIZES = dict()
+SIZES['small'] = dict(pools = 1, services = 8, templates = 8, customers = 5)
+SIZES['medium'] = dict(pools = 4, services = 200, templates = 200, customers = 50)
+SIZES['large'] = dict(pools = 24, services = 2000, templates = 2000, customers = 500)
+SIZES['huge'] = dict(pools = 48, services = 5000, templates = 5000, customers = 2000)
+
+class XMLStreamWriter:
+    '''Defines a writer that emits an XML document element by element
+    to a file, indented like the example scenarios. Nothing but the
+    names of the open elements is kept in memory.
+    '''
+    
+    def __init__(self, outfile):
+        self.outfile = outfile
+        self.open = []
+        self.outfile.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    
+    def _indent(self):
+        return '    ' * len(self.open)
+    
+    def start(self, tag):
+        self.outfile.write('%s<%s>\n' % (self._indent(), tag))
+        self.open.append(tag)
+    
+    def end(self):
+        tag = self.open.pop()
+        self.outfile.write('%s</%s>\n' % (self._indent(), tag))
+    
+    def element(self, tag, text):
+        self.outfile.write('%s<%s>%s</%s>\n' % (self._indent(), tag, xml.sax.saxutils.escape(str(text)), tag))
+    
+    def elements(self, tag, values):
+        # Writes an element with one child per (tag, text) pair
+        self.start(tag)
+        for child, text in values:
+            self.element(child, text)
+        self.end()
+
+
+class SyntheticScenarioGenerator:
+    '''Defines a generator for scenarios of arbitrary size, e.g. to
+    measure how loader, policies and scheduling loop scale. Services
+    are spread evenly over the resource pools. Each job template is a
+    random layered graph: a number of stages of parallel services,
+    where every service waits for up to fanIn services of the stage
+    before. Revenue and penalty of a template are the sums of biddings
+    and penalties of its services.
+    
+    Values are drawn from distributions given as functions of a
+    random.Random object. The defaults follow the findings from the
+    A*STAR dataset (see draw_distribution.py). Pool capacities are the
+    mean demand of the services of a pool times capacityFactor.
+    Template and customer shares follow a Zipf law with the given
+    exponents; with 0, all shares are equal and none are written.
+    '''
+    
+    def __init__(self, pools = 1, services = 8, templates = 8, customers = 5, seed = 'abcdefgh',
+                 goldRatio = 0.2, goldWeight = 10, stages = (2, 4), width = (1, 4), fanIn = 2,
+                 capacityFactor = 12.5, templateSkew = 0.0, customerSkew = 0.0,
+                 ticks = None, cpu = None, memory = None, bidding = None, penalty = None):
+        self.pools = pools
+        self.services = services
+        self.templates = templates
+        self.customers = customers
+        self.seed = seed
+        self.goldRatio = goldRatio
+        self.goldWeight = goldWeight
+        self.stages = stages
+        self.width = width
+        self.fanIn = fanIn
+        self.capacityFactor = capacityFactor
+        self.templateSkew = templateSkew
+        self.customerSkew = customerSkew
+        
+        self.ticks = ticks if ticks is not None else lambda rnd: rnd.gauss(12, 4)
+        self.cpu = cpu if cpu is not None else lambda rnd: rnd.gauss(13.30, 11.85)
+        self.memory = memory if memory is not None else lambda rnd: rnd.gauss(4600000, 3700000)
+        # Biddings depend on the CPU demand, penalties on the biddings
+        self.bidding = bidding if bidding is not None else lambda rnd, cpu: rnd.gauss(0.95, 0.3) * cpu
+        self.penalty = penalty if penalty is not None else lambda rnd, bid: rnd.gauss(bid, bid / 4.0)
+    
+    def __str__(self):
+        return 'SyntheticScenarioGenerator (%dRP, %dST, %dJT, %dC)' \
+            % (self.pools, self.services, self.templates, self.customers)
+    
+    def _getPoolIdentifier(self, index):
+        return 'ResourcePool%02d' % (index + 1)
+    
+    def _getServiceIdentifier(self, index):
+        return 'S%05d' % (index)
+    
+    def _getShare(self, index, skew):
+        return 1.0 / (index + 1) ** skew
+    
+    def _drawServices(self, rnd):
+        # Draws all services, keeping only the numbers needed later on
+        services = []
+        demands = [[0, 0] for i in range(self.pools)]
+        for i in range(self.services):
+            ticks = max(abs(int(self.ticks(rnd))), 1)
+            cpu = abs(int(self.cpu(rnd)))
+            mem = abs(int(self.memory(rnd)))
+            bid = self.bidding(rnd, float(cpu))
+            pen = self.penalty(rnd, bid)
+            services.append((ticks, cpu, mem, bid, pen))
+            demands[i % self.pools][0] += cpu
+            demands[i % self.pools][1] += mem
+        return services, demands
+    
+    def _drawSignature(self, rnd, services):
+        # Returns the signature in the dependency format, its revenue and penalty
+        entries = []
+        revenue = 0.0
+        penalty = 0.0
+        previous = []
+        for stage in range(rnd.randint(*self.stages)):
+            current = []
+            for i in range(rnd.randint(*self.width)):
+                service = rnd.randrange(len(services))
+                label = 'n%d' % (len(entries))
+                entry = '%s:%s' % (label, self._getServiceIdentifier(service))
+                if len(previous):
+                    predecessors = rnd.sample(previous, min(rnd.randint(1, self.fanIn), len(previous)))
+                    entry += ' <- ' + ', '.join(predecessors)
+                entries.append(entry)
+                current.append(label)
+                revenue += services[service][3]
+                penalty += services[service][4]
+            previous = current
+        return '; '.join(entries), revenue, penalty
+    
+    def write(self, filename):
+        rnd = random.Random(self.seed)
+        services, demands = self._drawServices(rnd)
+        
+        directory = os.path.dirname(filename)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        
+        with open(filename, 'w') as outfile:
+            writer = XMLStreamWriter(outfile)
+            writer.start('SNSimScenario')
+            writer.elements('Parameters', [('Seed', self.seed), ('GoldWeight', self.goldWeight), ('JobCount', 25)])
+            
+            writer.start('ResourcePools')
+            for i in range(self.pools):
+                count = len(range(i, self.services, self.pools))
+                writer.start('ResourcePool')
+                writer.element('Identifier', self._getPoolIdentifier(i))
+                writer.elements('Resources', [
+                    ('CPU', int(float(demands[i][0]) / max(count, 1) * self.capacityFactor)),
+                    ('Memory', int(float(demands[i][1]) / max(count, 1) * self.capacityFactor)),
+                    ('Bandwidth', 1)])
+                writer.end()
+            writer.end()
+            
+            writer.start('Customers')
+            for i in range(self.customers):
+                writer.start('Customer')
+                writer.element('Identifier', 'Customer%04d' % (i + 1))
+                writer.element('isGold', rnd.random() < self.goldRatio)
+                if self.customerSkew:
+                    writer.element('Share', '%.6f' % (self._getShare(i, self.customerSkew)))
+                writer.end()
+            writer.end()
+            
+            writer.start('Services')
+            for i, (ticks, cpu, mem, bid, pen) in enumerate(services):
+                writer.start('Service')
+                writer.element('Identifier', self._getServiceIdentifier(i))
+                writer.element('ResourcePool', self._getPoolIdentifier(i % self.pools))
+                writer.element('Ticks', ticks)
+                writer.elements('Resources', [('CPU', cpu), ('Memory', mem), ('Bandwidth', 0)])
+                writer.element('MaxAttempts', 100)
+                writer.end()
+            writer.end()
+            
+            writer.start('JobTemplates')
+            for i in range(self.templates):
+                signature, revenue, penalty = self._drawSignature(rnd, services)
+                writer.start('JobTemplate')
+                writer.element('Identifier', 'Pattern%05d' % (i + 1))
+                writer.element('Signature', signature)
+                writer.element('Revenue', '%.2f' % (revenue))
+                writer.element('Penalty', '%.2f' % (penalty))
+                if self.templateSkew:
+                    writer.element('Share', '%.6f' % (self._getShare(i, self.templateSkew)))
+                writer.end()
+            writer.end()
+            
+            writer.end()
+        print('File \'%s\' written.' % (filename))
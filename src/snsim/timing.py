@@ -0,0 +1,125 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import cProfile
+import pstats
+import time
+
+# Phases of a simulation iteration, used as indices
+GENERATION = 0
+BOUNCER = 1
+POLICY = 2
+START = 3
+STEP = 4
+LOAD = 5
+PHASES = ('generation', 'bouncer', 'policy', 'start', 'step', 'load')
+
+class PhaseTimer:
+    '''Defines a timer that accumulates the time spent in each phase
+    of the simulation loop with a high-resolution clock. The engine
+    marks where a phase begins (see enter), which also ends the phase
+    before, and where an iteration ends. The times of an iteration are
+    then added to the totals and stored in the load trace.
+    
+    Optionally, one phase is run under cProfile to see which calls
+    dominate it.
+    '''
+    
+    def __init__(self):
+        self.profilePhase = None
+        self.profiler = None
+        self.reset()
+    
+    def __getstate__(self):
+        # Profiles cannot be pickled, a new one is started after loading a checkpoint
+        state = dict(self.__dict__)
+        state['profiler'] = None
+        state['phase'] = None
+        return state
+    
+    def reset(self):
+        self.totals = [0] * len(PHASES)
+        self.current = [0] * len(PHASES)
+        self.iterations = 0
+        self.phase = None
+        self.mark = 0
+        self.profiler = None
+    
+    def setProfilePhase(self, phase):
+        # Takes the name of a phase or None to disable profiling
+        if phase is None:
+            self.profilePhase = None
+        else:
+            self.profilePhase = PHASES.index(phase)
+        self.profiler = None
+    
+    def enter(self, phase):
+        # Ends the running phase (if any) and begins the given one,
+        # None pauses the timer
+        now = time.perf_counter_ns()
+        if self.phase is not None:
+            self.current[self.phase] += now - self.mark
+            if self.phase == self.profilePhase:
+                self.profiler.disable()
+        if phase is not None and phase == self.profilePhase:
+            if self.profiler is None:
+                self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.phase = phase
+        self.mark = time.perf_counter_ns()
+    
+    def endIteration(self, loadData, iteration):
+        self.enter(None)
+        if loadData is not None:
+            loadData.setTimings(iteration, [t * 1e-9 for t in self.current])
+        for index in range(len(PHASES)):
+            self.totals[index] += self.current[index]
+            self.current[index] = 0
+        self.iterations += 1
+    
+    def getTotals(self):
+        # Returns the seconds spent in each phase
+        totals = dict()
+        for index, phase in enumerate(PHASES):
+            totals[phase] = self.totals[index] * 1e-9
+        return totals
+    
+    def getBreakdown(self):
+        overall = sum(self.totals)
+        breakdown = []
+        for index, phase in enumerate(PHASES):
+            share = float(self.totals[index]) / overall if overall else 0.0
+            breakdown.append('%s %.4fs (%.1f%%)' % (phase, self.totals[index] * 1e-9, 100.0 * share))
+        return ', '.join(breakdown)
+    
+    def printProfile(self, sort = 'cumulative', limit = 20):
+        if self.profiler is None:
+            return
+        print('Profile of phase \'%s\':' % (PHASES[self.profilePhase]))
+        pstats.Stats(self.profiler).sort_stats(sort).print_stats(limit)
+    
+    def exportProfile(self, filename):
+        # Writes the profile in the format read by pstats
+        if self.profiler is None:
+            print('! No profile recorded, not writing \'%s\'.' % (filename))
+            return
+        self.profiler.dump_stats(filename)
+        print('File \'%s\' written.' % (filename))
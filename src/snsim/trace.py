@@ -0,0 +1,315 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import numpy
+
+class LoadTrace:
+    '''Defines a columnar trace of the system load that a scenario
+    collects once per iteration. Each metric is kept in its own typed
+    array and all resource load ratios in one 2-D array with a column
+    per pool and resource. Arrays are preallocated and grow by doubling.
+    Columns are handed out as read-only views, so the bouncer and the
+    exporters can slice them without copying. For compatibility, an
+    entry can still be accessed like the former load dict, e.g.
+    trace[i]['resources'][pool][resource].
+    
+    If a sink (see TraceWriter) is given, rows are handed to it in
+    chunks while the simulation runs and only the unwritten rows plus
+    the last few retained ones are kept in memory. The arrays then hold
+    the iterations from offset on, i.e. iteration i is found at array
+    position i - offset, while len() still counts all iterations.
+    '''
+    
+    COUNTERS = ('activeJobs', 'activeServices', 'abortedJobs', 'declinedJobs')
+    VALUES = ('biddings', 'penalty')
+    # Seconds spent in each phase of an iteration (see snsim.timing)
+    TIMINGS = ('timeGeneration', 'timeBouncer', 'timePolicy', 'timeStart', 'timeStep', 'timeLoad')
+    
+    def __init__(self, resourcePools, capacity = 256, sink = None, retain = 64):
+        self.resourceIndex = dict()
+        self.resourceNames = []
+        for resPool in resourcePools:
+            self.resourceIndex[resPool] = dict()
+            for resource in resourcePools[resPool].resources:
+                self.resourceIndex[resPool][resource] = len(self.resourceNames)
+                self.resourceNames.append((resPool, resource))
+        
+        self.length = 0
+        self.offset = 0
+        self.flushed = 0
+        self.sink = sink
+        self.retain = retain
+        if self.sink is not None:
+            capacity = self.sink.chunkSize + self.retain
+        
+        self.capacity = 0
+        self.columns = dict()
+        for name in self.COUNTERS:
+            self.columns[name] = numpy.zeros(0, dtype = numpy.int64)
+        for name in self.VALUES + self.TIMINGS:
+            self.columns[name] = numpy.zeros(0, dtype = numpy.float64)
+        self.resources = numpy.zeros((0, len(self.resourceNames)), dtype = numpy.float64)
+        self.reserve(capacity)
+    
+    def __len__(self):
+        return self.length
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if index < self.offset or index >= self.length:
+            raise IndexError(index)
+        return LoadEntry(self, index - self.offset)
+    
+    def __iter__(self):
+        for index in range(self.length - self.offset):
+            yield LoadEntry(self, index)
+    
+    def __getstate__(self):
+        # Only pickle the filled part of the arrays (bounded traces
+        # keep their size, which is needed to make room)
+        state = dict(self.__dict__)
+        if self.sink is not None:
+            return state
+        size = self.length - self.offset
+        state['columns'] = dict()
+        for name in self.columns:
+            state['columns'][name] = self.columns[name][:size].copy()
+        state['resources'] = self.resources[:size].copy()
+        state['capacity'] = size
+        return state
+    
+    def reserve(self, capacity):
+        # Bounded traces keep their size, the sink makes room instead
+        if capacity <= self.capacity or (self.sink is not None and self.capacity > 0):
+            return
+        size = self.length - self.offset
+        for name in self.columns:
+            column = numpy.zeros(capacity, dtype = self.columns[name].dtype)
+            column[:size] = self.columns[name][:size]
+            self.columns[name] = column
+        resources = numpy.zeros((capacity, len(self.resourceNames)), dtype = numpy.float64)
+        resources[:size] = self.resources[:size]
+        self.resources = resources
+        self.capacity = capacity
+    
+    def _makeRoom(self):
+        # Hands the unwritten rows to the sink and moves the last
+        # retained rows to the front of the arrays.
+        self.flush()
+        start = max(self.length - self.retain, self.offset)
+        shift = start - self.offset
+        size = self.length - start
+        if shift <= 0:
+            return
+        for name in self.columns:
+            self.columns[name][:size] = self.columns[name][shift:shift + size]
+        self.resources[:size] = self.resources[shift:shift + size]
+        self.offset = start
+    
+    def flush(self):
+        if self.sink is None or self.flushed == self.length:
+            return
+        self.sink.write(self, self.flushed, self.length)
+        self.flushed = self.length
+    
+    def close(self):
+        if self.sink is None:
+            return
+        self.flush()
+        self.sink.close()
+    
+    def append(self, activeJobs, activeServices, abortedJobs, declinedJobs, biddings, penalty, resourceLoads):
+        if self.length - self.offset == self.capacity:
+            if self.sink is not None:
+                self._makeRoom()
+            else:
+                self.reserve(max(2 * self.capacity, 1))
+        index = self.length - self.offset
+        self.columns['activeJobs'][index] = activeJobs
+        self.columns['activeServices'][index] = activeServices
+        self.columns['abortedJobs'][index] = abortedJobs
+        self.columns['declinedJobs'][index] = declinedJobs
+        self.columns['biddings'][index] = biddings
+        self.columns['penalty'][index] = penalty
+        for name in self.TIMINGS:
+            self.columns[name][index] = 0.0
+        self.resources[index] = resourceLoads
+        self.length += 1
+        if self.sink is not None and self.length - self.flushed >= self.sink.chunkSize:
+            self.flush()
+    
+    def repeat(self, count):
+        # Appends count copies of the last entry
+        if count <= 0 or self.length == 0:
+            return
+        if self.sink is None and self.length + count > self.capacity:
+            self.reserve(max(self.length + count, 2 * self.capacity))
+        while count > 0:
+            size = self.length - self.offset
+            if size == self.capacity:
+                self._makeRoom()
+                size = self.length - self.offset
+            block = min(count, self.capacity - size)
+            for name in self.columns:
+                self.columns[name][size:size + block] = self.columns[name][size - 1]
+            for name in self.TIMINGS:
+                self.columns[name][size:size + block] = 0.0
+            self.resources[size:size + block] = self.resources[size - 1]
+            self.length += block
+            count -= block
+            if self.sink is not None and self.length - self.flushed >= self.sink.chunkSize:
+                self.flush()
+    
+    def setTimings(self, iteration, timings):
+        # Rows that are no longer held in memory keep their timings
+        index = iteration - self.offset
+        if index < 0 or iteration >= self.length:
+            return
+        for name, value in zip(self.TIMINGS, timings):
+            self.columns[name][index] = value
+    
+    def getColumn(self, name):
+        view = self.columns[name][:self.length - self.offset]
+        view.flags.writeable = False
+        return view
+    
+    def getResources(self):
+        view = self.resources[:self.length - self.offset]
+        view.flags.writeable = False
+        return view
+    
+    def getResourceLoad(self, resPool, resource):
+        view = self.resources[:self.length - self.offset, self.resourceIndex[resPool][resource]]
+        view.flags.writeable = False
+        return view
+
+
+class TraceWriter:
+    '''Defines a sink that writes the rows of a load trace to a file
+    in the format read by the gnuplot scripts, either at once (see
+    Scenario.exportTrace) or chunk by chunk while the simulation runs.
+    Every chunk is flushed to the file, so an interrupted run keeps
+    all iterations up to the last chunk.
+    '''
+    
+    HEADER = '#it actjobs actserv genjobs abrtjobs decljobs rescpu resmem bids pentys revenue\n'
+    
+    def __init__(self, filename, generator = None, chunkSize = 1024, resPool = 'ResourcePool01'):
+        self.filename = filename
+        self.generator = generator
+        self.chunkSize = chunkSize
+        self.resPool = resPool
+        self.outfile = None
+        self.position = 0
+    
+    def __getstate__(self):
+        # The file is reopened and cut back to the rows written so far
+        # when writing continues after loading a checkpoint.
+        state = dict(self.__dict__)
+        if self.outfile is not None:
+            state['position'] = self.outfile.tell()
+        state['outfile'] = None
+        return state
+    
+    def open(self):
+        if self.position > 0:
+            self.outfile = open(self.filename, 'r+')
+            self.outfile.truncate(self.position)
+            self.outfile.seek(self.position)
+            return
+        self.outfile = open(self.filename, 'w')
+        self.outfile.write(self.HEADER)
+    
+    def close(self):
+        if self.outfile is None:
+            return
+        self.position = self.outfile.tell()
+        self.outfile.close()
+        self.outfile = None
+    
+    def write(self, trace, start, stop, generatedJobs = None):
+        # Writes iterations start to stop. Generated jobs are taken from
+        # the given column (indexed like the trace arrays) if any, else
+        # from the generator.
+        if self.outfile is None:
+            self.open()
+        # Only the rows to write are read, the columns may be memory-mapped
+        first = start - trace.offset
+        last = stop - trace.offset
+        activeJobs = trace.getColumn('activeJobs')[first:last]
+        activeServices = trace.getColumn('activeServices')[first:last]
+        abortedJobs = trace.getColumn('abortedJobs')[first:last]
+        declinedJobs = trace.getColumn('declinedJobs')[first:last]
+        resourceCPU = trace.getResourceLoad(self.resPool, 'CPU')[first:last]
+        resourceMem = trace.getResourceLoad(self.resPool, 'Memory')[first:last]
+        accBiddings = trace.getColumn('biddings')[first:last]
+        accPenalties = trace.getColumn('penalty')[first:last]
+        accRevenue = accBiddings - accPenalties
+        resourceAvg = (resourceCPU + resourceMem) / 2.0
+        if generatedJobs is not None:
+            generatedJobs = generatedJobs[first:last]
+        
+        rows = []
+        for i in range(start, stop):
+            j = i - start
+            if generatedJobs is not None:
+                genJobs = generatedJobs[j]
+            elif self.generator is not None:
+                genJobs = self.generator._getAmountByIteration(i)
+            else:
+                genJobs = 0
+            rows.append('%d %d %d %d %d %d %.2f %.2f %.2f %.2f %.2f %.2f\n' % \
+                        (i, activeJobs[j], activeServices[j], genJobs, \
+                         abortedJobs[j], declinedJobs[j], resourceCPU[j], resourceMem[j], \
+                         accBiddings[j], accPenalties[j], accRevenue[j], resourceAvg[j]))
+        self.outfile.write(''.join(rows))
+        self.outfile.flush()
+
+
+class LoadEntry:
+    '''Defines a read-only view on a single iteration of a load trace
+    that behaves like the load dict collected in earlier versions.
+    '''
+    
+    KEYS = LoadTrace.COUNTERS + LoadTrace.VALUES + ('resources',)
+    
+    def __init__(self, trace, index):
+        self.trace = trace
+        self.index = index
+    
+    def __getitem__(self, key):
+        if key == 'resources':
+            resources = dict()
+            for resPool in self.trace.resourceIndex:
+                resources[resPool] = dict()
+                for resource, column in self.trace.resourceIndex[resPool].items():
+                    resources[resPool][resource] = float(self.trace.resources[self.index, column])
+            return resources
+        if key not in self.trace.columns:
+            raise KeyError(key)
+        return self.trace.columns[key][self.index].item()
+    
+    def __contains__(self, key):
+        return key in self.KEYS
+    
+    def keys(self):
+        return list(self.KEYS)
@@ -0,0 +1,216 @@
+# Copyright (c) 2012 Johannes Bendler
+# Licensed under the MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining 
+# a copy of this software and associated documentation files (the "Software"), 
+# to deal in the Software without restriction, including without limitation 
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included 
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
+# IN THE SOFTWARE.
+
+import json
+import struct
+
+import numpy
+
+import snsim.trace
+
+MAGIC = b'SNSTRACE'
+VERSION = 1
+ALIGNMENT = 64
+
+def _getResourceColumnName(resPool, resource):
+    return 'resource:%s:%s' % (resPool, resource)
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def writeBinaryTrace(filename, loadTrace, generator = None, metadata = None):
+    '''Writes a load trace to filename in the binary columnar format.
+    The file starts with a magic string, the format version and the
+    length of a JSON header, which lists every column with its type and
+    offset. Columns follow one after another, aligned to 64 bytes, so
+    each of them can be memory-mapped on its own.
+    '''
+    start = loadTrace.offset
+    length = len(loadTrace) - start
+    
+    columns = []
+    for name in snsim.trace.LoadTrace.COUNTERS + snsim.trace.LoadTrace.VALUES + snsim.trace.LoadTrace.TIMINGS:
+        columns.append((name, loadTrace.getColumn(name)))
+    generatedJobs = numpy.zeros(length, dtype = numpy.int64)
+    if generator is not None:
+        for i in range(length):
+            generatedJobs[i] = generator._getAmountByIteration(start + i)
+    columns.append(('generatedJobs', generatedJobs))
+    for resPool, resource in loadTrace.resourceNames:
+        columns.append((_getResourceColumnName(resPool, resource), loadTrace.getResourceLoad(resPool, resource)))
+    
+    header = dict()
+    header['length'] = length
+    header['start'] = start
+    header['resources'] = [list(name) for name in loadTrace.resourceNames]
+    header['metadata'] = metadata if metadata is not None else dict()
+    header['columns'] = []
+    
+    # Offsets depend on the header size, which in turn contains the
+    # offsets, so they are computed relative to the data section.
+    dataOffset = 0
+    for name, column in columns:
+        header['columns'].append({'name': name, 'dtype': column.dtype.str, 'offset': dataOffset})
+        dataOffset = _align(dataOffset + column.nbytes)
+    
+    encoded = json.dumps(header, sort_keys = True).encode('utf-8')
+    prefix = len(MAGIC) + struct.calcsize('<II')
+    dataStart = _align(prefix + len(encoded))
+    
+    with open(filename, 'wb') as outfile:
+        outfile.write(MAGIC)
+        outfile.write(struct.pack('<II', VERSION, len(encoded)))
+        outfile.write(encoded)
+        for column, entry in zip([column for name, column in columns], header['columns']):
+            outfile.seek(dataStart + entry['offset'])
+            outfile.write(numpy.ascontiguousarray(column).tobytes())
+        # Pad the file, so the last column can always be mapped
+        outfile.truncate(dataStart + dataOffset)
+    print('File \'%s\' written.' % (filename))
+
+
+class BinaryTraceException(Exception):
+    pass
+
+
+class BinaryTrace:
+    '''Defines a read-only load trace backed by a binary trace file.
+    Columns are memory-mapped on first access, so only the pages that
+    are actually read are loaded. Offers the same accessors as
+    snsim.trace.LoadTrace, so it can be handed to a TraceWriter.
+    '''
+    
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as infile:
+            magic = infile.read(len(MAGIC))
+            if magic != MAGIC:
+                raise BinaryTraceException('\'%s\' is not a binary trace file.' % (filename))
+            version, headerLength = struct.unpack('<II', infile.read(struct.calcsize('<II')))
+            if version != VERSION:
+                raise BinaryTraceException('\'%s\' has unsupported version %d.' % (filename, version))
+            header = json.loads(infile.read(headerLength).decode('utf-8'))
+        
+        self.length = header['length']
+        self.metadata = header['metadata']
+        self.resourceNames = [tuple(name) for name in header['resources']]
+        self.dataStart = _align(len(MAGIC) + struct.calcsize('<II') + headerLength)
+        self.columnInfo = dict()
+        for entry in header['columns']:
+            self.columnInfo[entry['name']] = entry
+        self.columns = dict()
+        # Like a streamed LoadTrace, array position 0 holds iteration offset
+        self.offset = header['start']
+    
+    def __len__(self):
+        return self.length
+    
+    def __str__(self):
+        return 'BinaryTrace (%s, %d iterations)' % (self.filename, self.length)
+    
+    def getColumnNames(self):
+        return list(self.columnInfo.keys())
+    
+    def getColumn(self, name):
+        if name not in self.columns:
+            if name not in self.columnInfo:
+                raise KeyError(name)
+            entry = self.columnInfo[name]
+            if self.length == 0:
+                self.columns[name] = numpy.zeros(0, dtype = numpy.dtype(entry['dtype']))
+            else:
+                self.columns[name] = numpy.memmap(self.filename, dtype = numpy.dtype(entry['dtype']), mode = 'r', \
+                                                  offset = self.dataStart + entry['offset'], shape = (self.length,))
+        return self.columns[name]
+    
+    def getResourceLoad(self, resPool, resource):
+        return self.getColumn(_getResourceColumnName(resPool, resource))
+
+
+class MergedTraces:
+    '''Defines a set of binary traces of several runs (e.g. policies
+    or bouncer modes) lined up by iteration. Runs are given as a dict
+    that maps a run name to its trace file. Only the common iterations
+    of all runs are covered, starting at iteration self.start, and the
+    data is read block by block from the mapped columns instead of
+    being loaded at once.
+    '''
+    
+    def __init__(self, filenames):
+        self.names = sorted(filenames.keys())
+        self.traces = dict()
+        for name in self.names:
+            self.traces[name] = BinaryTrace(filenames[name])
+        self.start = 0
+        self.length = 0
+        if self.traces:
+            self.start = max([trace.offset for trace in self.traces.values()])
+            stop = min([trace.offset + len(trace) for trace in self.traces.values()])
+            self.length = max(stop - self.start, 0)
+    
+    def __len__(self):
+        return self.length
+    
+    def getColumn(self, name):
+        # Returns the aligned column of every run, still memory-mapped
+        columns = dict()
+        for run in self.names:
+            trace = self.traces[run]
+            first = self.start - trace.offset
+            columns[run] = trace.getColumn(name)[first:first + self.length]
+        return columns
+    
+    def iterBlocks(self, columnName, blockSize = 65536):
+        # Yields (iteration, block) with one row per iteration starting
+        # at the given one and one column per run in the order of self.names
+        columns = self.getColumn(columnName)
+        for start in range(0, self.length, blockSize):
+            stop = min(start + blockSize, self.length)
+            block = numpy.empty((stop - start, len(self.names)), dtype = numpy.float64)
+            for i, run in enumerate(self.names):
+                block[:, i] = columns[run][start:stop]
+            yield self.start + start, block
+    
+    def exportColumn(self, columnName, filename, blockSize = 65536):
+        # Writes one column of all runs side by side, readable by gnuplot
+        with open(filename, 'w') as outfile:
+            outfile.write('#it %s\n' % (' '.join(self.names)))
+            for start, block in self.iterBlocks(columnName, blockSize):
+                rows = []
+                for i, values in enumerate(block.tolist()):
+                    rows.append('%d %s\n' % (start + i, ' '.join(['%.4f' % value for value in values])))
+                outfile.write(''.join(rows))
+            print('File \'%s\' written.' % (filename))
+
+
+def convertToText(filename, textFilename, resPool = 'ResourcePool01', blockSize = 65536):
+    '''Converts a binary trace file into the text format of
+    Scenario.exportTrace, which is read by the gnuplot scripts.
+    '''
+    trace = BinaryTrace(filename)
+    generatedJobs = trace.getColumn('generatedJobs')
+    writer = snsim.trace.TraceWriter(textFilename, resPool = resPool)
+    writer.open()
+    stop = trace.offset + len(trace)
+    for start in range(trace.offset, stop, blockSize):
+        writer.write(trace, start, min(start + blockSize, stop), generatedJobs)
+    writer.close()
+    print('File \'%s\' written.' % (textFilename))
@@ -19,7 +19,11 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS 
 # IN THE SOFTWARE.
 
-import xml.dom.minidom
+import hashlib
+import os
+import pickle
+import tempfile
+import xml.etree.ElementTree
 
 import snsim.resourcepool
 import snsim.service
@@ -27,18 +31,133 @@ import snsim.job
 import snsim.customer
 import snsim.scenario
 
+CACHE_VERSION = 3
+# Per user cache for callers that opt in. Cached records are unpickled
+# without further checks, so the directory must only be writable by
+# trusted users.
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'snsim')
+
 class XMLScenarioLoader:
     '''Defines a loader that parses scenarios described in XML
     format. Refer to example XML files for the exact format.
+    The file is read incrementally and compiled into plain records
+    (see _compile), from which the scenario objects are built. If a
+    cacheDirectory is given (e.g. DEFAULT_CACHE_DIRECTORY), compiled
+    records are cached there, keyed by a hash of the file content, so
+    loading the same scenario again skips parsing altogether.
     '''
     
-    def __init__(self, filename):
+    def __init__(self, filename, cacheDirectory = None):
         self.filename = filename
+        self.cacheDirectory = cacheDirectory
         self._parse()
     
     def __str__(self):
         return 'XMLScenarioLoader (%s)' % (str(self.filename))
     
+    def _getDigest(self, blockSize = 65536):
+        # Hashes the file block by block instead of reading it at once
+        digest = hashlib.sha1()
+        with open(self.filename, 'rb') as infile:
+            for block in iter(lambda: infile.read(blockSize), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _getCacheFilename(self, digest):
+        return os.path.join(self.cacheDirectory, '%s.v%d.pickle' % (digest, CACHE_VERSION))
+    
+    def _loadRecords(self):
+        if self.cacheDirectory is None:
+            return self._compile()
+        
+        cacheFilename = self._getCacheFilename(self._getDigest())
+        try:
+            with open(cacheFilename, 'rb') as cacheFile:
+                return pickle.load(cacheFile)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            pass
+        
+        records = self._compile()
+        try:
+            if not os.path.isdir(self.cacheDirectory):
+                os.makedirs(self.cacheDirectory)
+            # Write to a temporary file first, parallel workers may
+            # compile the same scenario at the same time.
+            descriptor, temporaryFilename = tempfile.mkstemp(dir = self.cacheDirectory)
+            with os.fdopen(descriptor, 'wb') as cacheFile:
+                pickle.dump(records, cacheFile, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporaryFilename, cacheFilename)
+        except (IOError, OSError):
+            print('! Could not write scenario cache to \'%s\'.' % (self.cacheDirectory))
+        return records
+    
+    def _compile(self):
+        # Streams through the document and turns each section entry into
+        # a record of plain values as soon as its end tag is read.
+        records = dict()
+        records['parameters'] = []
+        records['resourcePools'] = []
+        records['services'] = []
+        records['jobTemplates'] = []
+        records['customers'] = []
+        
+        parents = []
+        for event, element in xml.etree.ElementTree.iterparse(self.filename, events = ('start', 'end')):
+            if event == 'start':
+                parents.append(element)
+                continue
+            parents.pop()
+            parent = parents[-1].tag if len(parents) else None
+            
+            if parent == 'Parameters':
+                records['parameters'].append((element.tag, element.text))
+            elif element.tag == 'ResourcePool' and parent == 'ResourcePools':
+                records['resourcePools'].append((
+                    str(element.findtext('Identifier')),
+                    self._getResources(element)))
+            elif element.tag == 'Service' and parent == 'Services':
+                records['services'].append((
+                    str(element.findtext('Identifier')),
+                    self._getResources(element),
+                    str(element.findtext('ResourcePool')),
+                    int(element.findtext('Ticks')),
+                    float(element.findtext('MaxAttempts'))))
+            elif element.tag == 'JobTemplate' and parent == 'JobTemplates':
+                signature = str(element.findtext('Signature'))
+                try:
+                    signature = snsim.job.parseSignature(signature)
+                except (snsim.job.InvalidSignatureFormatException, snsim.job.TooManyNestedScopesException):
+                    # Kept as text, the template reports it when built
+                    pass
+                records['jobTemplates'].append((
+                    str(element.findtext('Identifier')),
+                    signature,
+                    float(element.findtext('Revenue')),
+                    float(element.findtext('Penalty')),
+                    float(element.findtext('Share', '1'))))
+            elif element.tag == 'Customer' and parent == 'Customers':
+                records['customers'].append((
+                    str(element.findtext('Identifier')),
+                    element.findtext('isGold') == 'True',
+                    float(element.findtext('Share', '1'))))
+            elif len(parents) > 2:
+                # Part of an entry, needed until the entry is compiled
+                continue
+            
+            # Entries, sections and unknown elements outside of entries
+            # are not needed any longer, so the tree never grows with
+            # the size of the file
+            element.clear()
+            if len(parents):
+                parents[-1].remove(element)
+        return records
+    
+    def _getResources(self, element):
+        resources = dict()
+        for resource in element.find('Resources'):
+            resources[str(resource.tag)] = float(resource.text)
+        return resources
+    
     def _parse(self):
         self.parameters = dict()
         self.resourcePools = dict()
@@ -46,51 +165,34 @@ class XMLScenarioLoader:
         self.jobTemplates = dict()
         self.customers = dict()
         
-        root = xml.dom.minidom.parse(self.filename)
+        records = self._loadRecords()
         
-        parameterList = root.getElementsByTagName('Parameters')[0]
-        for parameter in parameterList.childNodes:
-            if parameter.nodeType == parameter.ELEMENT_NODE:
-                self.parameters[parameter.nodeName] = parameter.firstChild.data
+        for name, value in records['parameters']:
+            self.parameters[name] = value
         
-        poolList = root.getElementsByTagName('ResourcePools')[0]
-        for pool in poolList.getElementsByTagName('ResourcePool'):
-            identifier = str(pool.getElementsByTagName('Identifier')[0].firstChild.data)
+        for identifier, resources in records['resourcePools']:
             if identifier in self.resourcePools:
                 print('! Skipping resource pool %s: Name already in use.' % (identifier))
                 continue
-            resources = dict()
-            for resource in pool.getElementsByTagName('Resources')[0].childNodes:
-                if resource.nodeType != resource.TEXT_NODE:
-                    resources[str(resource.nodeName)] = float(resource.firstChild.data)
             self.resourcePools[identifier] = snsim.resourcepool.ResourcePool(
                 identifier, 
                 resources)
         
-        serviceList = root.getElementsByTagName('Services')[0]
-        for service in serviceList.getElementsByTagName('Service'):
-            identifier = str(service.getElementsByTagName('Identifier')[0].firstChild.data)
+        for identifier, resources, resourcePoolIdentifier, ticks, maxAttempts in records['services']:
             if identifier in self.serviceTemplates:
                 print('! Skipping service template %s: Name already in use.' % (identifier))
                 continue
-            resourcePoolIdentifier = str(service.getElementsByTagName('ResourcePool')[0].firstChild.data)
             if resourcePoolIdentifier not in self.resourcePools:
                 print('! Skipping service template %s: Given resource pool identifier \'%s\' is unknown.' % (identifier, resourcePoolIdentifier))
                 continue
-            resources = dict()
-            for resource in service.getElementsByTagName('Resources')[0].childNodes:
-                if resource.nodeType != resource.TEXT_NODE:
-                    resources[str(resource.nodeName)] = float(resource.firstChild.data)
             self.serviceTemplates[identifier] = snsim.service.ServiceTemplate(
                 identifier,
                 resources,
                 self.resourcePools[resourcePoolIdentifier],
-                int(service.getElementsByTagName('Ticks')[0].firstChild.data),
-                float(service.getElementsByTagName('MaxAttempts')[0].firstChild.data))
+                ticks,
+                maxAttempts)
         
-        jobList = root.getElementsByTagName('JobTemplates')[0]
-        for job in jobList.getElementsByTagName('JobTemplate'):
-            identifier = str(job.getElementsByTagName('Identifier')[0].firstChild.data)
+        for identifier, signature, revenue, penalty, share in records['jobTemplates']:
             if identifier in self.jobTemplates:
                 print('! Skipping job %s: Name already in use.' % (identifier))
                 continue
@@ -98,32 +200,28 @@ class XMLScenarioLoader:
                 self.jobTemplates[identifier] = snsim.job.JobTemplate(
                     identifier,
                     self,
-                    str(job.getElementsByTagName('Signature')[0].firstChild.data),
-                    float(job.getElementsByTagName('Revenue')[0].firstChild.data),
-                    float(job.getElementsByTagName('Penalty')[0].firstChild.data))
+                    signature,
+                    revenue,
+                    penalty,
+                    share)
             except snsim.job.InvalidSignatureFormatException:
                 print('! Skipping job %s: Signature syntax is invalid.' % (identifier))
             except snsim.job.TooManyNestedScopesException:
                 print('! Skipping job %s: Too many nested scopes.' % (identifier))
             except snsim.job.InvalidServiceReferenceException as e:
                 print('! Skipping job %s: Signature contains invalid service reference \'%s\'.' % (identifier, e))
-    
-        customerList = root.getElementsByTagName('Customers')[0]
-        for customer in customerList.getElementsByTagName('Customer'):
-            identifier = str(customer.getElementsByTagName('Identifier')[0].firstChild.data)
+        
+        goldWeight = 1
+        if 'GoldWeight' in self.parameters:
+            goldWeight = float(self.parameters['GoldWeight'])
+        for identifier, isGold, share in records['customers']:
             if identifier in self.customers:
                 print('! Skipping customer %s: Name already in use.' % (identifier))
                 continue
-            isGold = False
-            if customer.getElementsByTagName('isGold')[0].firstChild.data == 'True':
-                isGold = True
-            goldWeight = 1
-            if 'GoldWeight' in self.parameters:
-                goldWeight = float(self.parameters['GoldWeight'])
-            self.customers[identifier] = snsim.customer.Customer(identifier, isGold, goldWeight)
+            self.customers[identifier] = snsim.customer.Customer(identifier, isGold, goldWeight, share)
         
         print('Finished XML import. Loaded %d resource pools, %d service templates, %d job templates, %d customers.' 
               % (len(self.resourcePools), len(self.serviceTemplates), len(self.jobTemplates), len(self.customers)))
         
     def getScenario(self):
-        return snsim.scenario.Scenario(self.parameters, self.resourcePools, self.serviceTemplates, self.jobTemplates, self.customers)
\ No newline at end of file
+        return snsim.scenario.Scenario(self.parameters, self.resourcePools, self.serviceTemplates, self.jobTemplates, self.customers)